@@ -0,0 +1,138 @@
+"""
+Time how the Proxmox widget turns API responses into a DataFrame on synthetic clusters of 100, 1,000 and 10,000
+guests: the original `normalize_records` and the single-pass `normalize_columns`, then a whole refresh querying each
+node or `/cluster/resources`. The API is replaced by canned responses, so network time is not included.
+
+Usage: python benchmarks/proxmox.py [--guests 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parents[1] / 'src'))
+
+from loguru import logger
+from pandas import DataFrame
+
+from pydashboard.modules.proxmox import Proxmox, records_to_df
+
+GUESTS_PER_NODE = 40
+
+
+def node(name: str, rnd: random.Random) -> dict:
+    return {'node': name, 'status': 'online', 'cpu': rnd.random(), 'maxcpu': 64, 'level': '', 'id': f'node/{name}',
+            'mem': rnd.randrange(2 ** 36), 'maxmem': 2 ** 38, 'disk': rnd.randrange(2 ** 36), 'maxdisk': 2 ** 40,
+            'uptime': rnd.randrange(10 ** 7), 'type': 'node', 'ssl_fingerprint': 'AB:' * 31 + 'CD'}
+
+
+def guest(vmid: int, hv: str, rnd: random.Random) -> dict:
+    running = rnd.random() < 0.8
+    vm = {'vmid': vmid, 'name': f'{hv}-{vmid}', 'status': 'running' if running else 'stopped', 'cpus': 4,
+          'cpu': rnd.random() if running else 0, 'mem': rnd.randrange(2 ** 32), 'maxmem': 2 ** 33,
+          'disk': rnd.randrange(2 ** 34), 'maxdisk': 2 ** 35, 'diskread': rnd.randrange(2 ** 40),
+          'diskwrite': rnd.randrange(2 ** 40), 'netin': rnd.randrange(2 ** 40), 'netout': rnd.randrange(2 ** 40),
+          'uptime': rnd.randrange(10 ** 7) if running else 0, 'tags': 'web;prod', 'template': 0,
+          'pressurecpufull': rnd.random(), 'pressurecpusome': rnd.random(), 'pressureiofull': rnd.random(),
+          'pressureiosome': rnd.random(), 'pressurememoryfull': rnd.random(), 'pressurememorysome': rnd.random()}
+    if running:
+        vm['pid'] = rnd.randrange(1, 2 ** 22)
+    if hv == 'lxc':
+        vm |= {'type': 'lxc', 'swap': rnd.randrange(2 ** 28), 'maxswap': 2 ** 29}
+    else:
+        vm |= {'memhost': rnd.randrange(2 ** 32), 'serial': 1, 'ha': {'managed': 0}}
+    if rnd.random() < 0.05:
+        vm['lock'] = 'backup'
+    return vm
+
+
+def cluster(guests: int, seed: int = 0) -> dict[tuple, list[dict]]:
+    """Responses of the API paths requested by the widget"""
+    rnd = random.Random(seed)
+    names = [f'pve{i}' for i in range(max(guests // GUESTS_PER_NODE, 1))]
+    responses = {('nodes',): [node(name, rnd) for name in names]}
+    resources = [{**n, 'type': 'node'} for n in responses['nodes',]]
+    for i in range(guests):
+        name, hv = names[i % len(names)], rnd.choice(('lxc', 'qemu'))
+        vm = guest(100 + i, hv, rnd)
+        responses.setdefault(('nodes', name, hv), []).append(vm)
+        resources.append({**{k: v for k, v in vm.items() if k not in ('swap', 'maxswap', 'pid', 'memhost')},
+                          'type': hv, 'node': name, 'id': f'{hv}/{vm["vmid"]}', 'maxcpu': vm['cpus']})
+    for name in names:
+        for hv in ('lxc', 'qemu'):
+            responses.setdefault(('nodes', name, hv), [])
+    responses['cluster', 'resources'] = resources
+    return responses
+
+
+class CannedSource:
+    def __init__(self, responses: dict[tuple, list[dict]]):
+        self.responses = responses
+
+    def fetch(self, query, func, ttl):
+        return self.responses[query]
+
+
+def legacy_records_to_df(records: list[dict]) -> DataFrame:
+    """`records_to_df` before the single-pass builder"""
+    all_keys = {k for record in records for k in record}
+
+    normalized = []
+    for record in records:
+        new_record = {}
+        for key in all_keys:
+            value = record.get(key)
+            if isinstance(value, (str, int, float)):
+                new_record[key] = value
+            else:
+                new_record[key] = ""
+        normalized.append(new_record)
+
+    df = DataFrame.from_records(normalized)
+    for col in df.columns:
+        sample = next((v for v in df[col] if v != ""), None)
+        if isinstance(sample, int):
+            df[col] = df[col].astype(object)
+    return df
+
+
+def best(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--guests', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    widgets = {}
+    for cluster_resources in (False, True):
+        widget = Proxmox(token_name='bench', token_secret='bench', use_cluster_resources=cluster_resources,
+                         logger=logger, id=f'proxmox_{cluster_resources}')
+        widgets['/cluster/resources' if cluster_resources else 'per node'] = widget
+
+    print(f'best of {args.repeat}, times in ms')
+    print(f'{"guests":>7} {"normalize_records":>18} {"normalize_columns":>18} {"refresh per node":>17} '
+          f'{"refresh /cluster/resources":>27}')
+    for guests in args.guests:
+        responses = cluster(guests)
+        for widget in widgets.values():
+            widget.source = CannedSource(responses)
+        rows = widgets['per node'].get_nodes_rows()
+
+        print(f'{guests:>7} {best(lambda: legacy_records_to_df(rows), args.repeat):>18.1f} '
+              f'{best(lambda: records_to_df(rows), args.repeat):>18.1f} '
+              f'{best(widgets["per node"], args.repeat):>17.1f} '
+              f'{best(widgets["/cluster/resources"], args.repeat):>27.1f}')
+
+
+if __name__ == '__main__':
+    main()
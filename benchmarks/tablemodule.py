@@ -0,0 +1,121 @@
+"""
+Time the formatting of large tables: the original `iterrows` pipeline, the column-wise `_mktable` and the column-wise
+`_mktable` with the render cache, on a first refresh and on a following one where only a few rows changed.
+
+Usage: python benchmarks/tablemodule.py [--rows 10000] [--repeat 5] [--changed 0.01] [--cache-size 16384]
+"""
+import argparse
+import random
+import sys
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).parents[1] / 'src'))
+
+from pandas import DataFrame
+from rich.text import Text
+
+from pydashboard.containers.tablemodule import _mktable, _render_cell
+from pydashboard.modules.qbittorrent import _human, _justify, colorize
+
+COLUMNS = ['name', 'size', 'progress', 'state', 'dlspeed', 'upspeed', 'eta', 'ratio']
+STATES = ['downloading', 'stalledDL', 'stalledUP', 'uploading', 'pausedUP', 'queuedDL', 'error']
+
+
+def torrents(rows: int, seed: int = 0) -> DataFrame:
+    rnd = random.Random(seed)
+    return DataFrame({
+        'hash'    : [f'{i:040x}' for i in range(rows)],
+        'name'    : [f'torrent-{i}' for i in range(rows)],
+        'size'    : [rnd.randrange(2 ** 20, 2 ** 36) for _ in range(rows)],
+        'progress': [rnd.choice((1.0, 1.0, 1.0, rnd.random())) for _ in range(rows)],
+        'state'   : [rnd.choice(STATES) for _ in range(rows)],
+        'dlspeed' : [rnd.choice((0, 0, 0, rnd.randrange(2 ** 24))) for _ in range(rows)],
+        'upspeed' : [rnd.choice((0, 0, rnd.randrange(2 ** 22))) for _ in range(rows)],
+        'eta'     : [rnd.choice((8640000, rnd.randrange(86400))) for _ in range(rows)],
+        'ratio'   : [round(rnd.random() * 5, 3) for _ in range(rows)],
+    })
+
+
+def refresh(df: DataFrame, changed: float, seed: int = 1) -> DataFrame:
+    """Copy of `df` with a fraction of the rows changed, like the next refresh of a mostly idle client"""
+    rnd = random.Random(seed)
+    df = df.copy()
+    for i in rnd.sample(range(len(df)), int(len(df) * changed)):
+        df.loc[i, 'dlspeed'] = rnd.randrange(2 ** 24)
+        df.loc[i, 'progress'] = rnd.random()
+        df.loc[i, 'eta'] = rnd.randrange(86400)
+    return df
+
+
+def legacy_mktable(df: DataFrame, humanize, justify, colorize, sortby, reverse, select_columns):
+    """`_mktable` before the column-wise pipeline"""
+    df = df.sort_values(sortby, ascending=[not r for r in reverse])
+    df = df[select_columns]
+    columns = select_columns
+
+    new_df = DataFrame()
+    for col in columns:
+        if col in humanize:
+            new_df.loc[:, col] = df[col].map(humanize[col]).astype(str)
+        else:
+            new_df.loc[:, col] = df[col].astype(str)
+    df = new_df.astype(str)
+
+    for col, func in colorize.items():
+        df.loc[:, col] = df[col].map(func)
+
+    table = [r[1].to_list() for r in df.iterrows()]
+    for row in table:
+        for i in range(len(columns)):
+            row[i] = Text.from_markup(row[i], justify=justify.get(columns[i], 'left'))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--changed', type=float, default=0.01, help='fraction of rows changed between refreshes')
+    parser.add_argument('--cache-size', type=int, default=16384, help='render cache size, like render_cache_size')
+    args = parser.parse_args()
+
+    first = torrents(args.rows)
+    second = refresh(first, args.changed)
+    options = dict(humanize=_human, justify=_justify, colorize={'state': colorize}, sortby=['name'],
+                   reverse=[False], select_columns=COLUMNS)
+
+    def new_cache():
+        # same cache TableModule keeps
+        return lru_cache(maxsize=args.cache_size, typed=True)(
+                lambda col, value, justify: _render_cell(value, _human.get(col), options['colorize'].get(col),
+                                                         justify))
+
+    def time_refreshes(func, cache: bool) -> tuple[float, float]:
+        """Best time of a first refresh and of the next one, the cache is warmed only by the first refresh"""
+        best_first = best_next = float('inf')
+        for _ in range(args.repeat):
+            render = new_cache() if cache else None
+            start = perf_counter()
+            func(first, render)
+            best_first = min(best_first, perf_counter() - start)
+            start = perf_counter()
+            func(second, render)
+            best_next = min(best_next, perf_counter() - start)
+        return best_first * 1000, best_next * 1000
+
+    cases = {
+        'iterrows (before)'         : (lambda df, render: legacy_mktable(df, **options), False),
+        'column-wise'               : (lambda df, render: _mktable(df, **options), False),
+        'column-wise + render cache': (lambda df, render: _mktable(df, **options, render=render), True),
+    }
+
+    print(f'{args.rows} rows, {len(COLUMNS)} columns, {args.changed:.0%} rows changed, best of {args.repeat}')
+    for name, (func, cache) in cases.items():
+        first_ms, next_ms = time_refreshes(func, cache)
+        print(f'{name:<28} first refresh {first_ms:8.1f} ms   next refresh {next_ms:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,9 @@
 import inspect
 import traceback
-from functools import wraps
+from functools import partial, wraps
 from random import randint
 from re import sub
 from threading import Event
-from time import sleep
 from typing import Any, Literal
 
 from durations import Duration
@@ -15,6 +14,7 @@ from textual.containers import ScrollableContainer
 from textual.widgets import Static
 
 from pydashboard.utils.ssh import SessionManager
+from pydashboard.utils.transport import ARROW_AVAILABLE, unpack
 from pydashboard.utils.types import Size
 
 severity_map = {
@@ -31,12 +31,18 @@ class BaseModule(ScrollableContainer):
     sess_id = None
     conn_id = None
     remote_settings = None
+    _initialized = False
+    _subscribed_size = None
+    # seconds between connection checks of widgets in push mode
+    push_heartbeat = 30
+    _last_render_hash = None
+    skipped_repaints = 0
 
     def __init__(self, *,
                  logger: '_logger.Logger',
                  id: str = None,
                  mod_type: str = None,
-                 refresh_interval: Literal['never'] | int | str | None = None,
+                 refresh_interval: Literal['never'] | float | str | None = None,
                  align_horizontal: Literal["left", "center", "right", "justify"] = "left",
                  align_vertical: Literal["top", "middle", "bottom"] = "top",
                  color: str = None,
@@ -56,15 +62,19 @@ class BaseModule(ScrollableContainer):
                  remote_username: str = None,
                  remote_password: str = None,
                  remote_key: str = None,
+                 remote_server_port: int = 60001,
                  ssh_strict_host_key_checking: Literal[True, False, 'accept-new'] | None = None,
                  # man ssh_config(5) - StrictHostKeyChecking
                  ssh_ignore_known_hosts_file: bool = False,
+                 remote_multiplex: bool = False,
+                 remote_push: bool = False,
                  **kwargs: Any):
         """
 
         Args:
             enabled: Enable/disable the widget <br><br> **TYPE:** `bool` <span class="doc-param-default"><b>DEFAULT: </b><code>True</code></span>
-            refresh_interval: How often to update module data, accepts a value in seconds or string with a time unit.
+            refresh_interval: How often to update module data, accepts a value in seconds (fractions allowed,
+                                e.g. `0.5`) or string with a time unit (e.g. `500ms`).
                                 `never`, `0`, `false`, `off`, `no`, `null` disable updating.
             align_horizontal: Horizontal alignment of the text
             align_vertical: Vertical alignment of the text
@@ -85,8 +95,13 @@ class BaseModule(ScrollableContainer):
             remote_username: Remote host SSH username
             remote_password: Remote host SSH password
             remote_key: Remote host SSH key
+            remote_server_port: Port PyDashboard server is listening on, on the remote host
             ssh_strict_host_key_checking: Control host key verification behaviour
             ssh_ignore_known_hosts_file: Ignore known hosts file (suppresses host key changed warning)
+            remote_multiplex: Share a single connection with the other multiplexed widgets of the same remote host and
+                                refresh together the ones that are due at the same time
+            remote_push: Let the server refresh the widget and send its content only when it changes, instead of
+                            asking for it at each refresh
 
         # Styling
         All the styling parameters shown above directly control the behaviour of Textual framework, the information
@@ -162,7 +177,7 @@ class BaseModule(ScrollableContainer):
             refresh_interval = 0
         elif isinstance(refresh_interval, str):
             refresh_interval = Duration(refresh_interval).seconds
-        self.refresh_interval: int = round(refresh_interval)
+        self.refresh_interval: float = refresh_interval
         self.logger.info('Setting {} refresh interval to {} second(s)', id, refresh_interval)
 
         self.styles.align_horizontal = align_horizontal
@@ -215,13 +230,18 @@ class BaseModule(ScrollableContainer):
         self.remote_username = remote_username
         self.remote_password = remote_password
         self.remote_key = remote_key
+        self.remote_server_port = remote_server_port
         self.mod_type = mod_type
         self.ssh_strict_host_key_checking = ssh_strict_host_key_checking
         self.ssh_ignore_known_hosts_file = ssh_ignore_known_hosts_file
+        self.remote_multiplex = remote_multiplex
+        self.remote_push = remote_push
 
         if remote_host:
             self.prepare_remote(remote_host, remote_port, remote_username, remote_password, remote_key, mod_type,
                                 ssh_strict_host_key_checking, ssh_ignore_known_hosts_file,
+                                remote_server_port=remote_server_port, remote_multiplex=remote_multiplex,
+                                remote_push=remote_push,
                                 id=id, refresh_interval=refresh_interval,
                                 align_horizontal=align_horizontal, align_vertical=align_vertical,
                                 color=color, border=border, title=title, title_align=title_align,
@@ -232,7 +252,8 @@ class BaseModule(ScrollableContainer):
                                 **kwargs)
 
     def prepare_remote(self, remote_host, remote_port, remote_username, remote_password, remote_key, mod_type,
-                       ssh_strict_host_key_checking, ssh_ignore_known_hosts_file, **kwargs):
+                       ssh_strict_host_key_checking, ssh_ignore_known_hosts_file, remote_server_port=60001,
+                       remote_multiplex=False, remote_push=False, **kwargs):
         self.remote_settings = {
             'connection': {
                 'host'                        : remote_host,
@@ -241,24 +262,50 @@ class BaseModule(ScrollableContainer):
                 'password'                    : remote_password,
                 'keyfile'                     : remote_key,
                 'ssh_strict_host_key_checking': ssh_strict_host_key_checking,
-                'ssh_ignore_known_hosts_file' : ssh_ignore_known_hosts_file
+                'ssh_ignore_known_hosts_file' : ssh_ignore_known_hosts_file,
+                'server_port'                 : remote_server_port,
             },
             'session'   : {
                 'module_name'    : mod_type,
                 'setter_function': self.set
             },
             'kwargs'    : kwargs,
+            'multiplex' : remote_multiplex,
+            'push'      : remote_push,
         }
 
     def init_remote(self):
         self.conn_id = SessionManager.create_connection(**self.remote_settings['connection'])
 
-        self.remote_root, self.sess_id = SessionManager.create_session(self.conn_id, **self.remote_settings['session'])
+        if self.remote_settings['multiplex']:
+            self.remote_root, self.sess_id, batcher = SessionManager.create_multiplexed_session(self.conn_id)
+            widget_id = self.remote_root.init_widget(**self.remote_settings['session'],
+                                                     **self.remote_settings['kwargs'])
+            self.call_target = partial(batcher.call, widget_id)
+            self.post_init_target = partial(self.remote_root.post_init_widget, widget_id)
+        else:
+            self.remote_root, self.sess_id = SessionManager.create_session(self.conn_id,
+                                                                           **self.remote_settings['session'])
 
-        self.remote_root.init_module(**self.remote_settings['kwargs'])
+            self.remote_root.init_module(**self.remote_settings['kwargs'])
+            widget_id = None
 
-        self.call_target = self.remote_root.call_module
-        self.post_init_target = self.remote_root.post_init_module
+            try:
+                call_packed = self.remote_root.call_module_packed
+            except AttributeError:
+                # server running an older version
+                self.call_target = self.remote_root.call_module
+            else:
+                def call_target(*args, **kwargs):
+                    return unpack(call_packed(ARROW_AVAILABLE, *args, **kwargs))
+
+                self.call_target = call_target
+            self.post_init_target = self.remote_root.post_init_module
+
+        if self.remote_settings['push']:
+            SessionManager.serve_callbacks(self.sess_id)
+            self.subscribe_target = partial(self.remote_root.subscribe, widget_id)
+            self._subscribed_size = None
 
     def __del__(self):
         if self.remote_root:
@@ -318,6 +365,16 @@ class BaseModule(ScrollableContainer):
         """Method called each time the module has to be updated"""
         pass
 
+    def stop(self):
+        """
+        Stop the background work started by the module, called when the widget is removed (also on exit) or, on the
+        server, when the client disconnects
+        """
+        pass
+
+    def on_unmount(self):
+        self.stop()
+
     def inject_dependencies(self, func, *args, reference_func=None, **kwargs):
         # Inspect function signature to check if it has a Size parameter
         signature = inspect.signature(reference_func or func)
@@ -336,64 +393,107 @@ class BaseModule(ScrollableContainer):
         return func(*args, **kwargs)
 
     def update(self, *args, **kwargs):
-        result = self.inject_dependencies(self.call_target, *args, reference_func=self.__call__, **kwargs)
+        self.show_result(self.inject_dependencies(self.call_target, *args, reference_func=self.__call__, **kwargs))
+
+    def show_result(self, result):
+        """Show the result of a module call in the widget"""
         if result is not None:
+            result_hash = _render_hash(result)
+            if result_hash is not None and result_hash == self._last_render_hash:
+                # same output as last time, skip the update and layout of the widget
+                self.skipped_repaints += 1
+                self.logger.trace('Output unchanged, skipped repaint ({} so far)', self.skipped_repaints)
+                return
+            self._last_render_hash = result_hash
             self.inner.update(result)
 
-    def on_ready(self, signal: Event):
-        while not signal.is_set():
-            try:
+    def on_ready(self, signal: Event) -> float | None:
+        """
+        Perform a single refresh step, called by the scheduler each time the module is due.
+
+        Returns:
+            Seconds to wait before the next step, `None` to stop refreshing.
+        """
+        if signal.is_set():
+            return None
+
+        try:
+            if not self._initialized:
                 if self.remote_settings:
                     self.init_remote()
                 self.reload_styles()
                 self.inject_dependencies(self.post_init_target, reference_func=self.__post_init__)
+                self._initialized = True
+
+            if self.remote_settings and self.remote_settings['push']:
+                return self.check_subscription()
+
+            self.update()
+            return self.refresh_interval or None
+
+        except SSHCommsChannel2Error as e:
+            return self.handle_remote_connection_exception("SSH: stderr not available", e)
+        except IncorrectLogin as e:
+            return self.handle_remote_connection_exception("SSH: incorrect login", e)
+        except HostPublicKeyUnknown as e:
+            return self.handle_remote_connection_exception("SSH: unknown host public key", e)
+
+        except SSHCommsError as e:
+            ## ssh to a nonexistent/offline host
+            return self.handle_remote_connection_exception("SSH: " + e.stderr.split(':')[-1].strip(), e)
+        except (
+                ConnectionRefusedError, ConnectionResetError,  ## local port not available
+                EOFError  ## nothing listening on the remote side of the tunnel
+        ) as e:
+            if self.conn_id:
+                SessionManager.close(conn_id=self.conn_id)
+            return self.handle_remote_connection_exception(
+                    f"{self.remote_host} not listening for connections, closing connection \"{self.conn_id}\"", e)
+
+        except Exception as e:
+            self._initialized = False
+            super().notify(traceback.format_exc(), severity='error')
+            self.logger.exception(str(e))
+            return self.refresh_interval or 30
+
+    def check_subscription(self) -> float:
+        """
+        In push mode the server refreshes the widget by itself, here the connection is only checked periodically and
+        the subscription renewed when the widget has been resized.
+        """
+        size = (self.content_size.height, self.content_size.width)
+        if size != self._subscribed_size:
+            self.inject_dependencies(self.subscribe_target, self.on_push, ARROW_AVAILABLE,
+                                     reference_func=self.__call__)
+            self._subscribed_size = size
+        else:
+            SessionManager.ping(self.sess_id)
+        return max(self.refresh_interval or 0, self.push_heartbeat)
+
+    def on_push(self, payload):
+        """Called by the server, in push mode, each time the content of the widget changed"""
+        try:
+            self.show_result(unpack(payload))
+        except Exception as e:
+            self.logger.exception(str(e))
 
-                if not self.refresh_interval:
-                    self.update()
-                    return
-
-                while not signal.is_set():
-                    self.update()
-                    self.interruptibleWait(self.refresh_interval, signal)
-
-            except SSHCommsChannel2Error as e:
-                self.handle_remote_connection_exception("SSH: stderr not available", e, signal)
-            except IncorrectLogin as e:
-                self.handle_remote_connection_exception("SSH: incorrect login", e, signal)
-            except HostPublicKeyUnknown as e:
-                self.handle_remote_connection_exception("SSH: unknown host public key", e, signal)
-
-            except SSHCommsError as e:
-                ## ssh to a nonexistent/offline host
-                self.handle_remote_connection_exception("SSH: " + e.stderr.split(':')[-1].strip(), e, signal)
-            except (
-                    ConnectionRefusedError, ConnectionResetError,  ## local port not available
-                    EOFError  ## nothing listening on the remote side of the tunnel
-            ) as e:
-                if self.conn_id:
-                    SessionManager.close(conn_id=self.conn_id)
-                self.handle_remote_connection_exception(
-                        f"{self.remote_host} not listening for connections, closing connection \"{self.conn_id}\"", e,
-                        signal)
-
-            except Exception as e:
-                super().notify(traceback.format_exc(), severity='error')
-                self.logger.exception(str(e))
-                self.interruptibleWait(self.refresh_interval or 30, signal)
-
-    def handle_remote_connection_exception(self, text, e, signal):
+    def handle_remote_connection_exception(self, text, e):
+        self._initialized = False
         self.styles.border = ("round", "red")
         self.styles.border_subtitle_color = "red"
         self.border_subtitle = text
         super().notify(f"[red]{text}[/red].\n{e}", severity='error')
         self.logger.opt(depth=1).critical(f"{text} - {e}")
-        self.interruptibleWait(randint(10, 20), signal)
+        return randint(10, 20)
 
     @staticmethod
     def interruptibleWait(seconds, signal):
-        for _ in range(round(seconds)):
-            if signal.is_set(): return
-            sleep(1)
+        """
+        Wait up to `seconds` (fractions allowed), return immediately with `True` as soon as `signal` is set.
+
+        Not used for refreshing anymore, the scheduler takes care of it: kept for plugins waiting in their own threads.
+        """
+        return signal.wait(seconds)
 
     def notify(self, message, *, title="", severity="information", timeout=None, **kwargs):
         self.logger.opt(depth=1).log(severity_map.get(severity, "INFO"), message)
@@ -403,6 +503,15 @@ class BaseModule(ScrollableContainer):
         yield self.inner
 
 
+def _render_hash(result: str | Text) -> int | None:
+    """Hash of the output of a module, `None` if the output can't be compared"""
+    if isinstance(result, str):
+        return hash(result)
+    if isinstance(result, Text):
+        return hash((result.plain, tuple(result.spans), result.style, result.justify))
+    return None
+
+
 class ErrorModule(Static):
     DEFAULT_CSS = """
         ErrorModule {
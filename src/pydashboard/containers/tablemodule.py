@@ -1,14 +1,23 @@
 import time
-from typing import Any, Callable, Literal, Optional, cast
+from functools import lru_cache, partial
+from math import isnan
+from typing import Any, Callable, Literal, Optional, TYPE_CHECKING, cast
 
 import rpyc.utils.classic
-from pandas import DataFrame
+from rpyc.core.netref import BaseNetref
 from rich.text import Text
 from textual.widgets import DataTable
 
 from pydashboard.utils.lists import interleave
 from .basemodule import BaseModule
 
+if TYPE_CHECKING:
+    # pandas is imported only when needed to keep startup fast when no table is shown
+    from pandas import DataFrame, Series
+
+
+_NAN = float('nan')
+
 
 class TableModule(BaseModule):
     # after module initialization the object is automatically initialized, but
@@ -18,10 +27,15 @@ class TableModule(BaseModule):
     humanize = None
     justify: dict[str, Literal["default", "left", "center", "right", "full"] | None] = {}
     colorize = None
+    row_key: str | tuple[str, ...] | None = None
+    _rows: dict[str, list] = {}
+    _column_keys = []
+    _auto_width = []
 
     def __init__(self, *, columns: list[str] = None, show_header:bool=False, sizes:list[int]=None,
                  column_spacing: int = 1,
-                 sort: str | tuple[str, bool] | list[str | tuple[str, bool]] = None, **kwargs: Any):
+                 sort: str | tuple[str, bool] | list[str | tuple[str, bool]] = None,
+                 render_cache_size: int = 16384, **kwargs: Any):
         """
 
         Args:
@@ -31,12 +45,14 @@ class TableModule(BaseModule):
                     of columns, missing column widths will default to 0.
             column_spacing: Spacing between columns.
             sort: See [Sorting](tablemodule.md#sorting)
+            render_cache_size: How many formatted cells to keep in memory to avoid formatting again the same values
+                                at each refresh, `0` disables the cache.
             **kwargs: See [BaseModule](basemodule.md)
 
 
         """
         super().__init__(columns=columns, show_header=show_header, sizes=sizes, column_spacing=column_spacing,
-                         sort=sort, **kwargs)
+                         sort=sort, render_cache_size=render_cache_size, **kwargs)
         if not columns and sizes:
             raise ValueError("Parameter 'columns' cannot be empty when 'sizes' is not empty")
         self.columns = list(columns) if columns else []
@@ -65,6 +81,12 @@ class TableModule(BaseModule):
                         self.sortby.append(e)
                         self.reverse.append(False)
 
+        # not `_render_cache`, Textual widgets already have one
+        self._cell_cache = None
+        if render_cache_size:
+            # typed, or 1, 1.0 and True would share the same entry
+            self._cell_cache = lru_cache(maxsize=render_cache_size, typed=True)(self._format_cell)
+
         self.inner.show_header = show_header
         self.inner.show_cursor = False
         self.inner.cell_padding = 0
@@ -74,10 +96,17 @@ class TableModule(BaseModule):
         """Method called each time the module has to be updated"""
         pass
 
-    def update(self, *args, **kwargs):
-        result = self.inject_dependencies(self.call_target, *args, reference_func=self.__call__, **kwargs)
-        if self.remote_host:
-            # if running over a remote connection copy the dataframe locally
+    @property
+    def transport_columns(self) -> list[str] | None:
+        """Columns needed to show the table when running remotely, `None` if all the columns are shown"""
+        if not self.columns:
+            return None
+        keys = [self.row_key] if isinstance(self.row_key, str) else list(self.row_key or ())
+        return self.columns + (self.sortby or []) + keys
+
+    def show_result(self, result: 'Optional[DataFrame]'):
+        if isinstance(result, BaseNetref):
+            # server not sending packed results, copy the dataframe locally
             result = rpyc.utils.classic.obtain(result)
         if result is not None:
             if not result.empty:
@@ -85,21 +114,88 @@ class TableModule(BaseModule):
                     self.columns = result.columns.to_list()
                     self.make_header()
 
-                #FIXME clearing just before insertion randomly triggers a bug in Textual
-                # `self.inner.clear() needs to be moved down
-                self.inner.clear()
-                result = _mktable(df=result,
-                                  humanize=self.humanize,
-                                  justify=self.justify,
-                                  colorize=self.colorize,
-                                  sortby=self.sortby,
-                                  reverse=self.reverse,
-                                  select_columns=self.columns)
+                keys, result = _mktable(df=result,
+                                        humanize=self.humanize,
+                                        justify=self.justify,
+                                        colorize=self.colorize,
+                                        sortby=self.sortby,
+                                        reverse=self.reverse,
+                                        select_columns=self.columns,
+                                        row_key=self.row_key,
+                                        render=self.render_cell if self._cell_cache else None)
                 result = [interleave(r, '') for r in result]
-                # self.inner.clear() #clear only at last to avoid flickering
-                self.inner.add_rows(result)
+
+                if self._cell_cache:
+                    self.logger.debug('Render cache: {}', self.render_cache_info)
+
+                if keys is not None and len(set(keys)) == len(keys):
+                    self.update_rows(keys, result)
+                else:
+                    #FIXME clearing just before insertion randomly triggers a bug in Textual
+                    # `self.inner.clear() needs to be moved down
+                    self.inner.clear()
+                    self._rows = {}
+                    # self.inner.clear() #clear only at last to avoid flickering
+                    self.inner.add_rows(result)
             else:
                 self.inner.clear()
+                self._rows = {}
+
+    def update_rows(self, keys: list[str], rows: list[list]):
+        """
+        Apply to the table only the differences from the previous refresh: rows whose key disappeared are removed,
+        new rows are appended and only the cells that changed are updated. If the order of the rows already in the
+        table changed, or new rows should go anywhere but at the bottom, the table is rebuilt.
+        """
+        new_rows = dict(zip(keys, rows))
+        kept = [k for k in keys if k in self._rows]
+
+        if not self._rows or [k for k in self._rows if k in new_rows] != kept or keys[:len(kept)] != kept:
+            self.inner.clear()
+            for key, row in new_rows.items():
+                self.inner.add_row(*row, key=key)
+            self._rows = new_rows
+            return
+
+        for key in self._rows.keys() - new_rows.keys():
+            self.inner.remove_row(key)
+
+        for key in kept:
+            old_row = self._rows[key]
+            for column_key, update_width, old_cell, new_cell in zip(self._column_keys, self._auto_width,
+                                                                    old_row, new_rows[key]):
+                if old_cell != new_cell:
+                    self.inner.update_cell(key, column_key, new_cell, update_width=update_width)
+
+        for key in keys[len(kept):]:
+            self.inner.add_row(*new_rows[key], key=key)
+
+        self._rows = new_rows
+
+    def _format_cell(self, column: str, value: Any, justify: str) -> Text:
+        return _render_cell(value,
+                            self.humanize.get(column) if self.humanize else None,
+                            self.colorize.get(column) if self.colorize else None,
+                            justify)
+
+    def render_cell(self, column: str, value: Any, justify: str) -> Text:
+        """Format a single cell, reusing the result of a previous refresh if the same value was already formatted"""
+        if isinstance(value, float) and isnan(value):
+            # NaN is not equal to itself, use always the same object so that it's found in the cache
+            value = _NAN
+        if self._cell_cache is None:
+            return self._format_cell(column, value, justify)
+        try:
+            hash(value)
+        except TypeError:
+            # unhashable values are formatted at every refresh
+            return self._format_cell(column, value, justify)
+        return self._cell_cache(column, value, justify)
+
+    @property
+    def render_cache_info(self):
+        """Hits, misses, maximum and current size of the render cache"""
+        return self._cell_cache.cache_info() if self._cell_cache else None
 
     def make_header(self):
         if self.inner.show_header:
@@ -116,19 +212,21 @@ class TableModule(BaseModule):
 
         sizes = interleave(sizes, self.column_spacing)
 
-        for col, s in zip(columns, sizes):
-            self.inner.add_column(col, width=s)
+        self._column_keys = [self.inner.add_column(col, width=s) for col, s in zip(columns, sizes)]
+        self._auto_width = [s is None for s in sizes]
 
     def on_ready(self, signal):
-        self.make_header()
+        if not self.inner.columns:
+            self.make_header()
         return super().on_ready(signal)
 
 
-def _mktable(df: DataFrame, humanize: dict[str, Callable] = None,
+def _mktable(df: 'DataFrame', humanize: dict[str, Callable] = None,
              justify: dict[str, Literal["default", "left", "center", "right", "full"] | None] = None,
              colorize: dict[str, Callable] = None,
              sortby: list[str] = None, reverse: list[bool] = None,
-             select_columns: str | list[str] = None):
+             select_columns: str | list[str] = None, row_key: str | tuple[str, ...] = None,
+             render: Callable[[str, Any, str], Text] = None):
     if justify is None:
         justify = {}
 
@@ -138,41 +236,91 @@ def _mktable(df: DataFrame, humanize: dict[str, Callable] = None,
         else:
             df = df.sort_values(sortby, ascending=[not r for r in reverse])
 
+    keys = None
+    if row_key:
+        try:
+            if isinstance(row_key, str):
+                keys = df[row_key].astype(str).to_list()
+            else:
+                keys = ['\x1f'.join(map(str, k)) for k in df[list(row_key)].itertuples(index=False, name=None)]
+        except KeyError:
+            pass
+
     if select_columns:
         # exclude unwanted columns here AFTER sorting
-        df = df[select_columns]
-        columns = select_columns
+        columns = list(select_columns)
     else:
         columns = df.columns.to_list()
 
-    if humanize:
-        new_df = DataFrame()
-        # for col, func in humanize.items():
-        for col in columns:
-            if col in humanize:
-                try:
-                    # explicitly casting to str to avoid errors in future versions of pandas
-                    ### FutureWarning: Setting an item of incompatible dtype is deprecated and will raise in a future error of pandas.
-                    new_df.loc[:, col] = df[col].map(humanize[col]).astype(str)
-                except KeyError:
-                    pass
-            else:
-                new_df.loc[:, col] = df[col].astype(str)
-        df = new_df
+    if humanize is None:
+        humanize = {}
+    if colorize is None:
+        colorize = {}
+
+    cells = [_format_column(df[col], humanize.get(col), colorize.get(col), justify.get(col, 'left'),
+                            partial(render, col) if render else None)
+             for col in columns]
+
+    table = [list(row) for row in zip(*cells)]
+
+    return keys, table
+
+
+def _format_column(column: 'Series', humanize: Callable = None, colorize: Callable = None,
+                   justify: Literal["default", "left", "center", "right", "full"] | None = 'left',
+                   render: Callable[[Any, str], Text] = None) -> list[Text]:
+    """
+    Format a whole column into rich Text cells.
+
+    Formatters are applied only once for each distinct value, results are then mapped back to every row.
+    Markup is parsed only for cells that can contain it. If `render` is passed it's used to format each distinct
+    value instead of `humanize` and `colorize`.
+    """
+    from pandas import Series, factorize
+
+    try:
+        codes, uniques = factorize(column, use_na_sentinel=False)
+        values = Series(uniques, dtype=column.dtype)
+    except TypeError:
+        # unhashable values, format every cell
+        codes, values = None, column.reset_index(drop=True)
+
+    if render is not None:
+        texts = [render(v, justify) for v in values.to_list()]
+    else:
+        texts = [_render_cell(v, None, colorize, justify) for v in _humanize_values(values, humanize)]
+
+    if codes is None:
+        return texts
+    return [texts[c] for c in codes]
+
+
+def _humanize_values(values: 'Series', humanize: Callable = None) -> list:
+    if humanize is not None:
+        try:
+            values = values.map(humanize)
+        except KeyError:
+            pass
+
+    return values.to_list()
 
-    df = df.astype(str)
 
-    if colorize:
-        for col, func in colorize.items():
-            try:
-                df.loc[:, col] = df[col].map(func)
-            except KeyError:
-                pass
+def _render_cell(value: Any, humanize: Callable = None, colorize: Callable = None,
+                 justify: Literal["default", "left", "center", "right", "full"] | None = 'left') -> Text:
+    """Turn a single value into a rich Text cell"""
+    if humanize is not None:
+        try:
+            value = humanize(value)
+        except KeyError:
+            pass
 
-    table = [r[1].to_list() for r in df.iterrows()]
+    # not using `astype(str)` because recent versions of pandas keep missing values as NaN
+    if not isinstance(value, str):
+        value = str(value)
 
-    for row in table:
-        for i in range(len(columns)):
-            row[i] = Text.from_markup(row[i], justify=justify.get(columns[i], 'left'))
+    if colorize is not None:
+        value = colorize(value)
 
-    return table
+    if '[' in value:
+        return Text.from_markup(value, justify=justify)
+    return Text(value, justify=justify)
@@ -5,7 +5,7 @@ from math import isnan
 from typing import Any, Literal
 
 from pydashboard.containers import BaseModule
-from pydashboard.utils.bars import calc_bars_sizes, create_bar
+from pydashboard.utils.bars import BarHistory, calc_bars_sizes, create_bar
 from pydashboard.utils.types import Size
 
 CMD_STATUS = b"\x00\x06status"
@@ -29,7 +29,8 @@ ALL_UNITS = (
 class APCUPSd(BaseModule):
 
     def __init__(self, *, title: str = None, host: str = "localhost", port: int = 3551, timeout: int = 30,
-                 bars: Literal['auto', 0, 1, 2] = 0, **kwargs: Any):
+                 bars: Literal['auto', 0, 1, 2] = 0, history: int = 0,
+                 history_style: Literal['block', 'braille'] = 'block', **kwargs: Any):
         """
         Args:
             title: if not set or null defaults to ups model
@@ -37,13 +38,20 @@ class APCUPSd(BaseModule):
             port: APCUPSd server port
             timeout: Connection timeout seconds
             bars: Whether to show status bars on 1 or 2 lines or automatically ('auto', 0)
+            history: Width in characters of the load and battery history shown before each bar, 0 to disable. Each
+                     character is a sample (two with `braille` style), so the history covers
+                     `history * refresh_interval` seconds
+            history_style: Draw the history with block elements (8 levels) or braille patterns (4 levels, twice the
+                           samples)
             **kwargs: See [BaseModule](../containers/basemodule.md)
         """
-        super().__init__(title=title, host=host, port=port, timeout=timeout, bars=bars, **kwargs)
+        super().__init__(title=title, host=host, port=port, timeout=timeout, bars=bars, history=history,
+                         history_style=history_style, **kwargs)
         self.host = host
         self.port = port
         self.timeout = timeout
         self.bars = bars
+        self.history = BarHistory(history, history_style)
         self.__model_as_title = title is None
 
     def __post_init__(self, content_size: Size):
@@ -89,16 +97,19 @@ class APCUPSd(BaseModule):
         batt_color = 'green' if battery_charge > battery_warning else (
             'yellow' if battery_charge > battery_low else 'red')
 
+        load_spark, batt_spark = self.history.update(('load', 'battery'),
+                                                     (ups_load if ups_load > -1 else None, battery_charge))
+
         load_power = f'{load_power}W ' if load_power is not None else ''
         if ups_load > -1:
-            load_bar = create_bar(self.lbar, ups_load, f'{load_power}{ups_load}%', '', load_color)
+            load_bar = create_bar(self.lbar, ups_load, f'{load_power}{ups_load}%', '', load_color, load_spark)
         else:
             load_bar = load_power
 
         battery_runtime = f'{battery_runtime}m ' if not isnan(battery_runtime) else ''
         if not isnan(battery_charge):
             batt_bar = create_bar(self.rbar, battery_charge,
-                                  f'{battery_runtime}{battery_charge}%', '', batt_color)
+                                  f'{battery_runtime}{battery_charge}%', '', batt_color, batt_spark)
         else:
             batt_bar = battery_runtime
 
@@ -1,17 +1,28 @@
+import fcntl
 import os
 import pty
+import signal
+import struct
+import termios
 from select import select
 from shlex import split
-from subprocess import run
+from subprocess import DEVNULL, Popen, TimeoutExpired
+from threading import Lock, Thread
+from time import monotonic
 from typing import Any
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.terminal import LineBuffer, Screen
 from pydashboard.utils.types import Size
 
 
 class CmdRunner(BaseModule):
+    # while the command is running, output is shown at most this often (seconds)
+    live_interval = 0.5
+
     def __init__(self, *, args: str | list[str], pipe_stdout: bool = True, pipe_stderr: bool = True,
-                 wraplines: bool = False, shell: bool = False, **kwargs: Any):
+                 wraplines: bool = False, shell: bool = False, timeout: float = None, max_lines: int = 1000,
+                 follow: bool = False, **kwargs: Any):
         """
         Run a terminal command, if any of pipe_stdout or pipe_stderr are set, command will be run in a pseudo-terminal (pty).
 
@@ -21,51 +32,156 @@ class CmdRunner(BaseModule):
             pipe_stderr: Capture output from stderr
             wraplines: Wrap lines longer than widget width
             shell: Run command in a shell (allows glob expansion, piping and redirection)
+            timeout: Terminate the command if still running after `timeout` seconds
+            max_lines: Maximum number of lines of output to keep, older lines are discarded
+            follow: Start the command once and keep showing its output, for commands that run continuously (e.g.
+                `journalctl -f`, `tail -F`, `vmstat 1`, `top -b`), see [below](#follow-mode)
             **kwargs: See [BaseModule](../containers/basemodule.md)
+
+        # Follow mode
+        With `follow: true` the command is not run again at each refresh: it is started once and its output is
+        interpreted like a terminal would, including cursor movements and screen clearing, showing the last screen
+        (as large as the widget). If the command exits, its exit code is shown and it is started again at the next
+        refresh. `timeout`, `max_lines` and `wraplines` don't apply.
         """
         super().__init__(args=args, pipe_stdout=pipe_stdout, pipe_stderr=pipe_stderr, wraplines=wraplines, shell=shell,
-                         **kwargs)
+                         timeout=timeout, max_lines=max_lines, follow=follow, **kwargs)
         self.args = args if shell or isinstance(args, list) else split(args)
         self.shell = shell
         self.master_fd, self.slave_fd = pty.openpty()
         self.stdout_pipe = self.slave_fd if pipe_stdout else None
         self.stderr_pipe = self.slave_fd if pipe_stderr else None
         self.wraplines = wraplines
-        self._screen = ''
+        self.timeout = timeout
+        self.follow = follow
+        self._screen = LineBuffer(max_lines)
+        # follow mode
+        self._terminal: Screen | None = None
+        self._proc: Popen | None = None
+        self._reader: Thread | None = None
+        # once stopped, the command is not started again in follow mode
+        self._stopped = False
+        self._exit_shown = False
+        self._read_lock = Lock()
 
     def __post_init__(self):
         if self.wraplines and not self.remote_root:
             self.inner.styles.width = self.content_size.width
 
-    def run(self, content_size: Size):
+    def spawn(self, content_size: Size) -> Popen:
         env = os.environ | {
             'LINES'  : str(content_size[0]),
             'COLUMNS': str(content_size[1]),
         }
+        self.set_window_size(content_size)
 
-        proc = run(args=self.args, env=env, stdout=self.stdout_pipe, stderr=self.stderr_pipe, shell=self.shell)
         self.logger.debug('Running {}', self.args if isinstance(self.args, str) else ' '.join(self.args))
+        # new session, so the command and all its children can be terminated together on timeout
+        return Popen(args=self.args, env=env, stdin=DEVNULL, stdout=self.stdout_pipe, stderr=self.stderr_pipe,
+                     shell=self.shell, start_new_session=True)
+
+    def set_window_size(self, content_size: Size):
+        """Size reported by the pty to the programs asking for it"""
+        fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, struct.pack('HHHH', content_size[0], content_size[1], 0, 0))
 
-        self._screen = ''
+    def run(self, content_size: Size):
+        proc = self.spawn(content_size)
+        self._screen.clear()
+        deadline = None if self.timeout is None else monotonic() + self.timeout
+        next_render = monotonic() + self.live_interval
 
         while True:
             ready, _, _ = select((self.master_fd,), (), (), .1)
 
-            if self.master_fd in ready:
-                next_line_to_process = os.read(self.master_fd, 1024)
-                if next_line_to_process:
-                    # process the output
-                    self._screen += next_line_to_process.decode()
-                elif proc.returncode is not None:
-                    # The program has exited, and we have read everything written to stdout
-                    ready = filter(lambda x: x is not self.master_fd, ready)
+            if ready:
+                self._screen.feed(os.read(self.master_fd, 65536))
+            elif proc.poll() is not None:
+                # The program has exited, and we have read everything written to stdout
+                break
+
+            now = monotonic()
+            if deadline is not None and now >= deadline and proc.poll() is None:
+                self.logger.warning('{} timed out after {}s', self.args, self.timeout)
+                self.terminate(proc)
+                self._screen.feed(f'\n[Timed out after {self.timeout}s]'.encode())
+                deadline = None
+            elif now >= next_render and proc.poll() is None:
+                next_render = now + self.live_interval
+                self.render_live(self._screen.text())
+
+    @staticmethod
+    def terminate(proc: Popen):
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(1)
+        except TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        except ProcessLookupError:
+            pass
 
-            if not ready:
+    def render_live(self, text: str):
+        """Show the output received so far, while the command is still running"""
+        # only widgets shown on this computer, remote widgets get the output at the next refresh
+        if self.is_mounted:
+            self.show_result(text)
+
+    def start_follow(self, content_size: Size):
+        if self._reader is not None:
+            # the reader of the previous process may still be reading its last output
+            self._reader.join(1)
+        with self._read_lock:
+            self._terminal = Screen(*content_size)
+        self._proc = self.spawn(content_size)
+        self._exit_shown = False
+        self._reader = Thread(target=self.read_follow, args=(self._proc, self._terminal), name=f'CmdRunner-{self.id}',
+                              daemon=True)
+        self._reader.start()
+
+    def read_follow(self, proc: Popen, terminal: Screen):
+        """Feed the output of `proc` to `terminal` until it exits, or until the command is started again"""
+        next_render = monotonic()
+        while True:
+            ready, _, _ = select((self.master_fd,), (), (), .1)
+            if ready:
+                with self._read_lock:
+                    if terminal is not self._terminal:
+                        break
+                    terminal.feed(os.read(self.master_fd, 65536))
+                    text = terminal.text() if monotonic() >= next_render else None
+                if text is not None:
+                    next_render = monotonic() + self.live_interval
+                    self.render_live(text)
+            elif proc.poll() is not None:
                 break
 
+    def stop(self):
+        self._stopped = True
+        if self._proc is not None and self._proc.poll() is None:
+            self.terminate(self._proc)
+
+    def follow_output(self, content_size: Size) -> str:
+        if self._stopped:
+            # a refresh already running when the widget was removed
+            return ''
+        if self._proc is None or (self._proc.poll() is not None and self._exit_shown):
+            self.start_follow(content_size)
+        elif self._proc.poll() is not None:
+            self._exit_shown = True
+            with self._read_lock:
+                return f'{self._terminal.text()}\n[Exited with code {self._proc.returncode}]'
+
+        with self._read_lock:
+            if content_size != (self._terminal.rows, self._terminal.cols):
+                self._terminal.resize(*content_size)
+                self.set_window_size(content_size)
+            return self._terminal.text()
+
     def __call__(self, content_size: Size):
+        if self.follow:
+            return self.follow_output(content_size)
         self.run(content_size=content_size)
-        return self._screen
+        return self._screen.text()
 
 
 widget = CmdRunner
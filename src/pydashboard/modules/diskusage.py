@@ -1,3 +1,6 @@
+import select
+from concurrent.futures import Future, wait
+from threading import Thread
 from typing import Any
 
 import psutil
@@ -14,7 +17,8 @@ _names_map = {
     'free'      : 'Avail',
     'percent'   : 'Use%',
     'mountpoint': 'Mounted on',
-    'opts'      : 'Options'
+    'opts'      : 'Options',
+    'status'    : 'Status',
 }
 
 _justify = {
@@ -26,6 +30,7 @@ _justify = {
     'percent'   : 'right',
     'mountpoint': 'left',
     'opts'      : 'left',
+    'status'    : 'left',
 }
 
 _human = {
@@ -35,33 +40,135 @@ _human = {
     'percent': perc_fmt(),
 }
 
+_usage_fields = ('total', 'used', 'free', 'percent')
+
+
+def colorize_status(status):
+    return status if status == 'ok' else f'[red]{status}[/red]'
+
+
+class MountWatcher:
+    def __init__(self, path: str = '/proc/self/mountinfo'):
+        """
+        Tells whether filesystems have been mounted or unmounted, the kernel signals changes to the mount table with
+        an exceptional condition on `/proc/self/mountinfo`.
+        Where not available, the mount table is reported as always changed.
+        """
+        self._poll = None
+        try:
+            self._file = open(path, 'rb')
+            self._poll = select.poll()
+            self._poll.register(self._file, select.POLLPRI | select.POLLERR)
+            # consume the event pending since the file was opened
+            self._poll.poll(0)
+        except (OSError, AttributeError):
+            self._poll = None
+
+    def changed(self) -> bool:
+        """Whether the mount table changed since the last call"""
+        return self._poll is None or bool(self._poll.poll(0))
+
+    def close(self):
+        if self._poll is not None:
+            self._file.close()
+            self._poll = None
+
+
+def _disk_usage(mountpoint: str, future: Future):
+    try:
+        future.set_result(psutil.disk_usage(mountpoint))
+    except BaseException as e:
+        future.set_exception(e)
+
 
 class DiskUsage(TableModule):
+    colorize = {'status': colorize_status}
     column_names = _names_map
     justify = _justify
+    row_key = 'mountpoint'
 
     def __init__(self, *, columns: list[str] = ('device', 'fstype', 'total', 'used', 'free', 'percent', 'mountpoint'),
                  sort: str | tuple[str, bool] | list[str | tuple[str, bool]] | None = 'mountpoint',
-                 exclude: list[str] = None, human_readable: bool = True, **kwargs: Any):
+                 exclude: list[str] = None, human_readable: bool = True, timeout: float = 2, **kwargs: Any):
         """
 
         Args:
-            columns: Available columns: <br>`device`, `mountpoint`, `fstype`, `opts`, `total`, `used`, `free`, `percent`
+            columns: Available columns: <br>`device`, `mountpoint`, `fstype`, `opts`, `total`, `used`, `free`,
+                `percent`, `status`
             sort: See [Sorting](../containers/tablemodule.md#sorting)
             exclude: Filesystem types to exclude
             human_readable: Convert sizes to human readable strings
+            timeout: Seconds to wait for the usage of the filesystems, the ones not responding in time (e.g. a network
+                filesystem whose server is unreachable) are shown with the last known usage and status `stale`. They
+                are not queried again until they respond, in the meantime their status is `unresponsive`
             **kwargs: See [TableModule](../containers/tablemodule.md)
         """
         self.exclude = exclude
         self.humanize = _human if human_readable else None
+        self.timeout = timeout
         super().__init__(columns=columns, show_header=kwargs.pop('show_header', True), exclude=exclude,
-                         human_readable=human_readable, sort=sort, **kwargs)
+                         human_readable=human_readable, sort=sort, timeout=timeout, **kwargs)
+        self.mounts = MountWatcher()
+        self._partitions = None
+        # last usage of each mountpoint, and requests not completed yet
+        self._usage: dict[str, dict] = {}
+        self._pending: dict[str, Future] = {}
+
+    def get_partitions(self):
+        """Partitions list, requested again only when the mount table changed"""
+        if self._partitions is None or self.mounts.changed():
+            self._partitions = [part._asdict() for part in psutil.disk_partitions()
+                                if not self.exclude or part.fstype not in self.exclude]
+            mountpoints = {part['mountpoint'] for part in self._partitions}
+            self._usage = {k: v for k, v in self._usage.items() if k in mountpoints}
+            self._pending = {k: v for k, v in self._pending.items() if k in mountpoints}
+        return self._partitions
+
+    @staticmethod
+    def query(mountpoint: str) -> Future:
+        """Request the usage of `mountpoint` on a daemon thread, so that a hung filesystem can't block the exit"""
+        future = Future()
+        Thread(target=_disk_usage, args=(mountpoint, future), name=f'DiskUsage-{mountpoint}', daemon=True).start()
+        return future
+
+    def stop(self):
+        self.mounts.close()
+        # the threads still waiting for a filesystem are left behind, they don't keep the process alive
+        self._pending.clear()
+        super().stop()
 
     def __call__(self):
-        partitions = [{**part._asdict(), **psutil.disk_usage(part.mountpoint)._asdict()} for part in
-                      psutil.disk_partitions() if not self.exclude or part.fstype not in self.exclude]
+        partitions = self.get_partitions()
+
+        # a filesystem still busy since a previous refresh is neither queried again nor waited for, so it holds at
+        # most one thread
+        unresponsive = set(self._pending)
+        futures = {}
+        for part in partitions:
+            mountpoint = part['mountpoint']
+            future = self._pending.get(mountpoint)
+            if future is None:
+                future = self._pending[mountpoint] = self.query(mountpoint)
+            futures[mountpoint] = future
+        wait([f for m, f in futures.items() if m not in unresponsive], timeout=self.timeout)
 
-        return DataFrame.from_records(partitions)
+        rows = []
+        for part in partitions:
+            mountpoint = part['mountpoint']
+            future = futures[mountpoint]
+            if not future.done():
+                status = 'unresponsive' if mountpoint in unresponsive else 'stale'
+            else:
+                # partitions mounted on the same mountpoint share the same future
+                self._pending.pop(mountpoint, None)
+                try:
+                    self._usage[mountpoint] = future.result()._asdict()
+                    status = 'ok'
+                except OSError as e:
+                    self._usage.pop(mountpoint, None)
+                    status = e.strerror or type(e).__name__
+            rows.append({**part, **self._usage.get(mountpoint, dict.fromkeys(_usage_fields, '')), 'status': status})
 
+        return DataFrame.from_records(rows)
 
 widget = DiskUsage
@@ -1,7 +1,12 @@
-from requests.exceptions import ConnectionError
-from requests_unixsocket import get
+from collections import Counter
+from http.client import HTTPException
+import socket
+from threading import Event, Thread
+from time import monotonic, time
+from typing import Any
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.docker import ContainerIndex, DEFAULT_SOCKET, DockerClient, DockerError, UnixHTTPConnection
 from pydashboard.utils.types import Size
 from pydashboard.utils.units import sizeof_fmt
 
@@ -15,48 +20,187 @@ _color_state = {
     "dead"      : "[red]dead[/red]",
 }
 
+# header counter of each state when following events, where /info is not requested at every refresh. Like the
+# ContainersRunning, ContainersPaused and ContainersStopped counters of /info, everything not running or paused is
+# counted as stopped
+_state_counter = {
+    "created"   : "stopped",
+    "restarting": "stopped",
+    "running"   : "running",
+    "removing"  : "stopped",
+    "paused"    : "paused",
+    "exited"    : "stopped",
+    "dead"      : "stopped",
+}
+
 
 class Docker(BaseModule):
-    """
-    Docker module has no specific configuration parameters, see [BaseModule](../containers/basemodule.md).
-
-    !!! warning
-        This module needs the user to be in the `docker` group to get sufficient permissions to connect to docker.
-        If not present yet, the `docker` group has to be created.
-        ```bash
-        sudo addgroup docker
-        sudo adduser $(whoami) docker
-        ```
-
-        It's totally fine if the above command produce the following outputs:
-        ``` title="sudo addgroup docker"
-        fatal: The group `docker' already exists.
-        ```
-        ``` title="sudo adduser $(whoami) docker"
-        info: The user `alessandro' is already a member of `docker'.
-        ```
-    """
+    def __init__(self, *, socket_path: str = DEFAULT_SOCKET, df_interval: float = 300, follow_events: bool = False,
+                 **kwargs: Any):
+        """
+        Docker containers, images and volumes summary.
+
+        Args:
+            socket_path: Path of the Docker daemon socket
+            df_interval: Disk usage is computed by Docker walking all the images and volumes, which can take seconds
+                on hosts with many images, so it is refreshed in background every `df_interval` seconds instead of
+                every `refresh_interval`
+            follow_events: Load the container list once and then keep it up to date following the Docker events,
+                instead of requesting the whole list at every refresh. Recommended on hosts with many containers.
+                The containers counts are then computed from the list, counting as stopped every container neither
+                running nor paused, like Docker does.
+            **kwargs: See [BaseModule](../containers/basemodule.md)
+
+        !!! warning
+            This module needs the user to be in the `docker` group to get sufficient permissions to connect to docker.
+            If not present yet, the `docker` group has to be created.
+            ```bash
+            sudo addgroup docker
+            sudo adduser $(whoami) docker
+            ```
+
+            It's totally fine if the above command produce the following outputs:
+            ``` title="sudo addgroup docker"
+            fatal: The group `docker' already exists.
+            ```
+            ``` title="sudo adduser $(whoami) docker"
+            info: The user `alessandro' is already a member of `docker'.
+            ```
+        """
+        super().__init__(socket_path=socket_path, df_interval=df_interval, follow_events=follow_events, **kwargs)
+        self.socket_path = socket_path
+        self.df_interval = df_interval
+        self.follow_events = follow_events
+        self._df = None
+        self._df_version = 0
+        self._df_future = None
+        self._df_time = None
+        self.index = ContainerIndex()
+        # image and volume counts, only requested again after an image or volume event when following events
+        self._counts = None
+        self._counts_stale = Event()
+        self._follow_error = None
+        self._follower: Thread | None = None
+        self._events_conn: UnixHTTPConnection | None = None
+        self._stop = Event()
+        self._last_render = None
+
+    def __post_init__(self):
+        self.client = DockerClient.get(self.socket_path)
+        # __post_init__ runs again after errors, the follower already retries on its own
+        if self.follow_events and self._follower is None:
+            self._follower = Thread(target=self.follow, name=f'DockerEvents-{self.id}', daemon=True)
+            self._follower.start()
+
+    def stop(self):
+        self._stop.set()
+        conn = self._events_conn
+        if conn is not None and conn.sock is not None:
+            try:
+                # wakes up the follower waiting for the next event
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def follow(self, retry_interval: float = 5):
+        """
+        Keep the container index up to date, reloading it whenever the events stream is interrupted, until the widget
+        is stopped
+        """
+        while not self._stop.is_set():
+            try:
+                # events happened while the list is being loaded are received again, applying them twice is harmless
+                since = time()
+                self.index.load(self.client.request('/containers/json?all=true'))
+                self._counts_stale.set()
+                self._follow_error = None
+                self._events_conn = UnixHTTPConnection(self.socket_path)
+                for event in self.client.events(since=since, filters={'type': ['container', 'image', 'volume']},
+                                                connection=self._events_conn):
+                    if self._stop.is_set():
+                        return
+                    if event.get('Type') == 'container':
+                        self.index.apply(event)
+                    elif event.get('Action') in ('delete', 'destroy', 'create', 'pull', 'import', 'load', 'tag',
+                                                 'untag'):
+                        self._counts_stale.set()
+                if self._stop.is_set():
+                    return
+                self.logger.warning('Docker events stream closed')
+            except (OSError, HTTPException, DockerError, ValueError) as e:
+                if self._stop.is_set():
+                    return
+                self._follow_error = e
+                self.logger.error('Docker events stream error: {}', e)
+            self._stop.wait(retry_interval)
+
+    def get_disk_usage(self):
+        """Last disk usage received, a new one is requested in background when the current one is too old"""
+        if self._df_future is not None and self._df_future.done():
+            future, self._df_future = self._df_future, None
+            try:
+                self._df = future.result()
+                self._df_version += 1
+            except (OSError, DockerError) as e:
+                self.logger.error('Cannot get Docker disk usage: {}', e)
+        if self._df_future is None and (self._df_time is None or monotonic() - self._df_time >= self.df_interval):
+            self._df_time = monotonic()
+            self._df_future = self.client.submit('/system/df')
+        return self._df
+
+    def get_events_state(self) -> tuple[int, list[dict[str, str]], tuple[int, int]]:
+        """
+        Index version, containers and images and volumes count when following events. Images and volumes are counted
+        again only after an image or volume event.
+        """
+        if self.index.version == 0:
+            if self._follow_error is not None:
+                raise self._follow_error
+            # the first load is in progress
+            self.index.load(self.client.request('/containers/json?all=true'))
+        if self._counts is None or self._counts_stale.is_set():
+            self._counts_stale.clear()
+            sys_info, vol_info = self.client.request_many('/info', '/volumes')
+            self._counts = sys_info["Images"], len(vol_info['Volumes'] or [])
+        return *self.index.snapshot(), self._counts
 
     def __call__(self, size: Size):
         try:
-            sys_info = get('http+unix://%2Fvar%2Frun%2Fdocker.sock/info').json()
-            sys_df = get('http+unix://%2Fvar%2Frun%2Fdocker.sock/system/df').json()
-            vol_info = get('http+unix://%2Fvar%2Frun%2Fdocker.sock/volumes').json()
-            ctr_info = get('http+unix://%2Fvar%2Frun%2Fdocker.sock/containers/json?all=true').json()
+            sys_df = self.get_disk_usage()
+            if self.follow_events:
+                version, ctr_info, (images, volumes) = self.get_events_state()
+                # nothing changed since the last refresh
+                render_key = (version, images, volumes, self._df_version, size)
+                if self._last_render is not None and self._last_render[0] == render_key:
+                    return self._last_render[1]
+                counts = Counter(_state_counter.get(c['State'], 'stopped') for c in ctr_info)
+                containers = len(ctr_info)
+                running, paused, stopped = counts['running'], counts['paused'], counts['stopped']
+            else:
+                sys_info, vol_info, ctr_info = self.client.request_many('/info', '/volumes',
+                                                                        '/containers/json?all=true')
+                ctr_info = [{'Names': c['Names'][0].split('/')[-1], 'State': c['State']} for c in ctr_info]
+                images, volumes = sys_info["Images"], len(vol_info['Volumes'] or [])
+                containers, running = sys_info["Containers"], sys_info["ContainersRunning"]
+                paused, stopped = sys_info["ContainersPaused"], sys_info["ContainersStopped"]
+                render_key = None
 
             max_len = 0
             for ctr in ctr_info:
-                ctr['Names'] = ctr['Names'][0].split('/')[-1]
                 l = len(ctr["State"])
                 if l > max_len:
                     max_len = l
             ctr_info.sort(key=lambda x: x["Names"])
 
-            cont_spc = sizeof_fmt()(sum([c.get("SizeRw", 0) for c in sys_df['Containers']]), div=1000.0)
-            imgs_spc = sizeof_fmt()(sum([c.get("Size", 0) for c in sys_df['Images']]), div=1000.0)
-            vols_spc = sizeof_fmt()(sum([c.get("UsageData", {}).get("Size", 0) for c in sys_df['Volumes']]), div=1000.0)
+            if sys_df is None:
+                cont_spc = imgs_spc = vols_spc = '...'
+            else:
+                fmt = sizeof_fmt(div=1000.0)
+                cont_spc = fmt(sum([c.get("SizeRw", 0) for c in sys_df['Containers'] or []]))
+                imgs_spc = fmt(sum([c.get("Size", 0) for c in sys_df['Images'] or []]))
+                vols_spc = fmt(sum([c.get("UsageData", {}).get("Size", 0) for c in sys_df['Volumes'] or []]))
 
-            return (
+            output = (
                 """Containers: {cont:>3}   Running: [green]{runn:>3}[/green]\n"""
                 """ Images:    {imgs:>3}   Paused:  [yellow]{paus:>3}[/yellow]\n"""
                 """ Volumes:   {vols:>3}   Stopped: [red]{stop:>3}[/red]\n"""
@@ -64,12 +208,12 @@ class Docker(BaseModule):
                 """ Images: {imgs_spc:<8} Volumes:    {vols_spc}\n"""
             ).format_map(
                     dict(
-                            cont=sys_info["Containers"],
-                            runn=sys_info["ContainersRunning"],
-                            imgs=sys_info["Images"],
-                            paus=sys_info["ContainersPaused"],
-                            vols=len(vol_info),
-                            stop=sys_info["ContainersStopped"],
+                            cont=containers,
+                            runn=running,
+                            imgs=images,
+                            paus=paused,
+                            vols=volumes,
+                            stop=stopped,
                             cont_spc=cont_spc,
                             imgs_spc=imgs_spc,
                             vols_spc=vols_spc,
@@ -80,10 +224,12 @@ class Docker(BaseModule):
                         for c in ctr_info
                     ]
             )
+            self._last_render = (render_key, output)
+            return output
         except FileNotFoundError:
             self.logger.error('Cannot connect to Docker')
             return "[yellow]Docker not installed[/yellow]"
-        except (ConnectionError, PermissionError) as e:
+        except (ConnectionError, PermissionError, TimeoutError, DockerError) as e:
             self.logger.error('Docker connection error: {}', e)
             return f"[red]{e}[/red]"
 
@@ -1,14 +1,13 @@
-from functools import cache
 from threading import Timer
 from time import strftime
 from typing import Any
 
 import feedparser
-import requests
 from pandas import DataFrame
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
 from pydashboard.containers import TableModule
+from pydashboard.utils.http import get_session
 
 
 class FeedReader(TableModule):
@@ -21,11 +20,13 @@ class FeedReader(TableModule):
         'published_parsed': lambda t: f"[yellow]{t}[/yellow]",
         'source'          : lambda t: f"[green]{t}[/green]"
     }
+    row_key = 'link'
 
     __cache = {}
 
     def __init__(self, *, feeds: list[str], show_source: bool = True, show_publish_date: bool = True,
-                 show_index: bool = False, limit: int = 20, **kwargs: Any):
+                 show_index: bool = False, limit: int = 20, timeout: float = 30, http2: bool = False,
+                 **kwargs: Any):
         """
         RSS feed reader.
 
@@ -35,6 +36,8 @@ class FeedReader(TableModule):
             show_publish_date: Show feed entry publish date
             show_index: Show feed entry index
             limit: How many entries to show
+            timeout: Request timeout in seconds
+            http2: Use HTTP/2 if supported by the server, requires `httpx[http2]`
             **kwargs: See [TableModule](../containers/tablemodule.md)
         """
         columns = []
@@ -47,35 +50,53 @@ class FeedReader(TableModule):
         columns.append('title')
 
         super().__init__(columns=columns, show_header=False, feeds=feeds, show_source=show_source,
-                         show_publish_date=show_publish_date, show_index=show_index, limit=limit, **kwargs)
+                         show_publish_date=show_publish_date, show_index=show_index, limit=limit, timeout=timeout,
+                         http2=http2, **kwargs)
 
         self.feeds = feeds
         self.limit = limit
-
-    @cache
-    def cache_redirects(self, url):
-        newurl = requests.head(url, allow_redirects=True).url
-        if newurl != url:
-            self.logger.info('Caching redirection for {} to {}', url, newurl)
-        return newurl
+        self.timeout = timeout
+        self.http2 = http2
+        self.__redirects = {}
+        self.__validators = {}
+
+    def fetch(self, feed_url):
+        url = self.__redirects.get(feed_url, feed_url)
+        # send back ETag and Last-Modified so that unchanged feeds are not downloaded again
+        response = get_session(url, http2=self.http2).get(url, headers=self.__validators.get(feed_url, {}),
+                                                          timeout=self.timeout)
+        if response.history and response.url != url:
+            self.logger.info('Caching redirection for {} to {}', feed_url, response.url)
+            self.__redirects[feed_url] = response.url
+        return response
 
     def get_feed(self, feed_url):
         try:
             self.logger.debug("Getting feed from {}", feed_url)
-            feed = feedparser.parse(self.cache_redirects(feed_url))
-            self.logger.debug("Feed request returned {}", feed.status)
-            if feed.status == 200:
+            response = self.fetch(feed_url)
+            self.logger.debug("Feed request returned {}", response.status_code)
+            if response.status_code == 304 and feed_url in self.__cache:
+                return self.__cache[feed_url]
+            elif response.status_code == 200:
+                feed = feedparser.parse(response.content, response_headers=response.headers)
+                validators = {}
+                if 'etag' in response.headers:
+                    validators['If-None-Match'] = response.headers['etag']
+                if 'last-modified' in response.headers:
+                    validators['If-Modified-Since'] = response.headers['last-modified']
+                self.__validators[feed_url] = validators
+
                 for entry in feed.entries:
                     entry['source'] = feed.feed.title
 
                 self.__cache[feed_url] = feed.entries
                 return feed.entries
-            elif feed.status == 429:
+            elif response.status_code == 429:
                 # Slow down requests if HTTP 429 Too Many Requests is being returned
                 # Next request will be sent after number of seconds specified in 
                 # header 'Retry-After' or 60 seconds if absent.
                 try:
-                    sleep_time = int(feed.headers.get('retry-after', '60'))
+                    sleep_time = int(response.headers.get('retry-after', '60'))
                 except KeyError | ValueError:
                     sleep_time = 60
 
@@ -87,9 +108,10 @@ class FeedReader(TableModule):
 
                 Timer(sleep_time + 1, retry).start()
             else:
-                self.notify(f"Failed to get RSS feed {feed_url}. Status code: {feed.status}", severity="warning")
-        except ConnectionError:
-            self.notify(f"Failed to get RSS feed {feed_url}. Connection error", severity="warning")
+                self.notify(f"Failed to get RSS feed {feed_url}. Status code: {response.status_code}",
+                            severity="warning")
+        except (ConnectionError, Timeout) as e:
+            self.notify(f"Failed to get RSS feed {feed_url}. {type(e).__name__}", severity="warning")
         return self.__cache.get(feed_url, [])
 
     def get_fresh_news(self):
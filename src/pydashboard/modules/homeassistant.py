@@ -3,10 +3,10 @@ from re import compile
 from typing import Any
 
 import urllib3
-from requests import get
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.http import get_session
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -25,7 +25,7 @@ def color_state(state):
 
 class HomeAssistant(BaseModule):
     def __init__(self, *, host: str, token: str, filters: list[str], port: int = 8123, scheme: str = 'https',
-                 **kwargs: Any):
+                 timeout: float = 30, http2: bool = False, **kwargs: Any):
         """
 
         Args:
@@ -34,6 +34,8 @@ class HomeAssistant(BaseModule):
             filters: RegEx string to filter entities
             port: HomeAssistant server port
             scheme: http or https
+            timeout: Request timeout in seconds
+            http2: Use HTTP/2 if supported by the server, requires `httpx[http2]`
             **kwargs: See [BaseModule](../containers/basemodule.md)
 
         # Example filters
@@ -55,12 +57,15 @@ class HomeAssistant(BaseModule):
           filters: ["binary_sensor\\.(?:(?:switch)|(?:button))"]
         ```
         """
-        super().__init__(host=host, token=token, filters=filters, port=port, scheme=scheme, **kwargs)
+        super().__init__(host=host, token=token, filters=filters, port=port, scheme=scheme, timeout=timeout,
+                         http2=http2, **kwargs)
         self.host = host
         self.token = token
         self.filters = filters
         self.port = port
         self.scheme = scheme
+        self.timeout = timeout
+        self.http2 = http2
         self.url = f'{scheme}://{host}:{port}/api/states'
         self.headers = {
             "Authorization": f"Bearer {token}",
@@ -69,7 +74,8 @@ class HomeAssistant(BaseModule):
 
     def __call__(self):
         try:
-            response = get(self.url, headers=self.headers, verify=False)
+            response = get_session(self.url, http2=self.http2).get(self.url, headers=self.headers, verify=False,
+                                                                   timeout=self.timeout)
             if response.status_code == 200:
                 states_dict = sorted(response.json(), key=lambda o: o["entity_id"])
                 out_str = ""
@@ -112,8 +118,8 @@ class HomeAssistant(BaseModule):
                 self.styles.border_subtitle_color = 'red'
                 self.logger.error('Request returned status code {} - {}', response.status_code, response.reason)
 
-        except ConnectionError as e:
-            self.border_subtitle = f'ConnectionError'
+        except (ConnectionError, Timeout) as e:
+            self.border_subtitle = type(e).__name__
             self.styles.border_subtitle_color = 'red'
             self.logger.critical(str(e))
         except JSONDecodeError as e:
@@ -1,10 +1,10 @@
 from json import JSONDecodeError
 from typing import Any
 
-from requests import get
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.http import get_session
 from pydashboard.utils.units import duration_fmt
 
 
@@ -12,7 +12,8 @@ def tick_to_seconds(ticks): return ticks / 10_000_000
 
 
 class Jellyfin(BaseModule):
-    def __init__(self, *, host: str, token: str, port: int = 443, scheme: str = 'https', **kwargs: Any):
+    def __init__(self, *, host: str, token: str, port: int = 443, scheme: str = 'https', timeout: float = 30,
+                 http2: bool = False, **kwargs: Any):
         """
 
         Args:
@@ -20,19 +21,25 @@ class Jellyfin(BaseModule):
             token: Jellyfin API token
             port: Jellyfin server port
             scheme: http or https
+            timeout: Request timeout in seconds
+            http2: Use HTTP/2 if supported by the server, requires `httpx[http2]`
             **kwargs: See [BaseModule](../containers/basemodule.md)
         """
-        super().__init__(host=host, token=token, port=port, scheme=scheme, **kwargs)
+        super().__init__(host=host, token=token, port=port, scheme=scheme, timeout=timeout, http2=http2,
+                         **kwargs)
         self.host = host
         self.token = token
         self.port = port
         self.scheme = scheme
+        self.timeout = timeout
+        self.http2 = http2
         self.url = f'{scheme}://{host}:{port}/Sessions?activeWithinSeconds=120'
         self.headers = {"Authorization": f"MediaBrowser Token={token}"}
 
     def __call__(self):
         try:
-            response = get(self.url, headers=self.headers)
+            response = get_session(self.url, http2=self.http2).get(self.url, headers=self.headers,
+                                                                   timeout=self.timeout)
 
             try:
                 sessions = response.json()
@@ -77,8 +84,8 @@ class Jellyfin(BaseModule):
 
             return users
 
-        except ConnectionError as e:
-            self.border_subtitle = f'ConnectionError'
+        except (ConnectionError, Timeout) as e:
+            self.border_subtitle = type(e).__name__
             self.styles.border_subtitle_color = 'red'
             self.logger.critical(str(e))
 
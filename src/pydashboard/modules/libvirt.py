@@ -1,13 +1,15 @@
 import os
 from math import ceil, floor
+from time import monotonic
 from typing import Any, Literal
 
 if '__PYD_SKIP_OPTIONAL_IMPORTS__' not in os.environ:
     try:
         # noinspection PyUnresolvedReferences
-        from libvirt import VIR_CONNECT_LIST_DOMAINS_ACTIVE, VIR_DOMAIN_AFFECT_LIVE, VIR_DOMAIN_BLOCKED, VIR_DOMAIN_CRASHED, \
-            VIR_DOMAIN_NOSTATE, VIR_DOMAIN_PAUSED, VIR_DOMAIN_PMSUSPENDED, VIR_DOMAIN_RUNNING, VIR_DOMAIN_SHUTDOWN, \
-            VIR_DOMAIN_SHUTOFF, openReadOnly, virDomain
+        from libvirt import VIR_DOMAIN_BLOCKED, VIR_DOMAIN_CRASHED, VIR_DOMAIN_NOSTATE, VIR_DOMAIN_PAUSED, \
+            VIR_DOMAIN_PMSUSPENDED, VIR_DOMAIN_RUNNING, VIR_DOMAIN_SHUTDOWN, VIR_DOMAIN_SHUTOFF, \
+            VIR_DOMAIN_STATS_BALLOON, VIR_DOMAIN_STATS_CPU_TOTAL, VIR_DOMAIN_STATS_STATE, VIR_DOMAIN_STATS_VCPU, \
+            libvirtError, openReadOnly, virConnect
 
         _state_map = {
             VIR_DOMAIN_NOSTATE    : "nostate",
@@ -25,7 +27,7 @@ else:
     _state_map = {}
 
 from pydashboard.containers import BaseModule
-from pydashboard.utils.bars import create_bar
+from pydashboard.utils.bars import BarHistory, create_bar
 from pydashboard.utils.types import Size
 from pydashboard.utils.units import perc_fmt, sizeof_fmt
 
@@ -43,11 +45,9 @@ _color_state_map = {
 
 
 class Libvirt(BaseModule):
-    times = {}
-
     def __init__(self, *, hypervisor_uri: str = 'qemu:///system',
-                 resource_usage: Literal['none', 'auto', 'onerow', 'tworow'] = 'auto',
-                 **kwargs: Any):
+                 resource_usage: Literal['none', 'auto', 'onerow', 'tworow'] = 'auto', history: int = 0,
+                 history_style: Literal['block', 'braille'] = 'block', **kwargs: Any):
         """
         !!! warning
             This module requires module `libvirt` to be installed. As this requires an external dependency, it must be
@@ -57,6 +57,10 @@ class Libvirt(BaseModule):
             hypervisor_uri: [Local](https://libvirt.org/uri.html#local-hypervisor-uris) or
                             [Remote](https://libvirt.org/uri.html#remote-uris) hypervisor URIs
             resource_usage: CPU and RAM usage bars style
+            history: Width in characters of the usage history shown before each bar, 0 to disable. Each character is a
+                     sample (two with `braille` style), so the history covers `history * refresh_interval` seconds
+            history_style: Draw the history with block elements (8 levels) or braille patterns (4 levels, twice the
+                           samples)
             **kwargs: See [BaseModule](../containers/basemodule.md)
 
         !!! warning
@@ -75,8 +79,14 @@ class Libvirt(BaseModule):
             info: The user `alessandro' is already a member of `libvirt'.
             ```
         """
-        super().__init__(hypervisor_uri=hypervisor_uri, resource_usage=resource_usage, **kwargs)
+        super().__init__(hypervisor_uri=hypervisor_uri, resource_usage=resource_usage, history=history,
+                         history_style=history_style, **kwargs)
         self.hypervisor_uri = hypervisor_uri
+        self.history = BarHistory(history, history_style)
+        self.conn: 'virConnect | None' = None
+        self.times: dict[str, tuple[int, int]] = {}
+        """CPU time and vCPUs of the running domains at `times_at`"""
+        self.times_at = 0.0
 
         if resource_usage == 'none':
             self.resource_rows = 0
@@ -89,11 +99,7 @@ class Libvirt(BaseModule):
 
     def __post_init__(self, content_size: Size):
         if self.resource_rows != 0:
-            with openReadOnly(self.hypervisor_uri) as conn:
-                self.times = {
-                    dom.name(): self.dom_cpu_dict(dom)
-                    for dom in conn.listAllDomains(VIR_CONNECT_LIST_DOMAINS_ACTIVE)
-                }
+            self.cpu_usage(*self.get_stats())
 
         if self.resource_rows < 0:
             if content_size[1] < 22:
@@ -101,28 +107,66 @@ class Libvirt(BaseModule):
             else:
                 self.resource_rows = 1
 
-    @staticmethod
-    def dom_cpu_dict(dom: 'virDomain'):
-        return {
-            'cpu_time': int(dom.getCPUStats(True)[0]['cpu_time']),
-            'vcpus'   : dom.vcpusFlags(VIR_DOMAIN_AFFECT_LIVE)
-        }
+    def connect(self) -> 'virConnect':
+        if self.conn is None:
+            self.conn = openReadOnly(self.hypervisor_uri)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except libvirtError:
+                pass
+            self.conn = None
+
+    def stop(self):
+        self.close()
+        super().stop()
+
+    def get_stats(self) -> tuple[float, list[tuple[str, dict[str, Any]]]]:
+        """
+        Stats of all the domains, requested with a single call on the connection kept open between refreshes. Returns
+        the monotonic time the stats were received at and the name and stats of each domain.
+        """
+        if self.resource_rows != 0:
+            flags = (VIR_DOMAIN_STATS_STATE | VIR_DOMAIN_STATS_CPU_TOTAL | VIR_DOMAIN_STATS_VCPU
+                     | VIR_DOMAIN_STATS_BALLOON)
+        else:
+            flags = VIR_DOMAIN_STATS_STATE
+
+        reused = self.conn is not None
+        try:
+            records = self.connect().getAllDomainStats(flags)
+        except libvirtError as e:
+            self.close()
+            if not reused:
+                raise
+            # the connection was lost (e.g. libvirtd restarted), try again once on a new one
+            self.logger.debug('Connection to {} lost ({}), reconnecting', self.hypervisor_uri, e)
+            records = self.connect().getAllDomainStats(flags)
+        return monotonic(), [(dom.name(), stats) for dom, stats in records]
+
+    def cpu_usage(self, now: float, stats: list[tuple[str, dict[str, Any]]]) -> dict[str, float]:
+        """CPU usage percent of the running domains since the previous call"""
+        times = {name: (s['cpu.time'], s.get('vcpu.current', 1)) for name, s in stats if 'cpu.time' in s}
+        elapsed = now - self.times_at
+
+        usage = {}
+        for name, (cpu_time, vcpus) in times.items():
+            old = self.times.get(name)
+            if old is None or old[1] != vcpus or elapsed <= 0:
+                # domain might have been just powered on or its vCPUs number has changed, old data is invalid
+                usage[name] = 0
+            else:
+                usage[name] = (cpu_time - old[0]) / (1e9 * vcpus * elapsed) * 100
+
+        self.times, self.times_at = times, now
+        return usage
 
     def __call__(self, content_size: Size):
-        with openReadOnly(self.hypervisor_uri) as conn:
-            states = [
-                (dom.name(), _state_map.get(dom.state()[0], "unknown"))
-                for dom in conn.listAllDomains()
-            ]
-            if self.resource_rows > 0:
-                new_times = {
-                    dom.name(): self.dom_cpu_dict(dom)
-                    for dom in conn.listAllDomains(VIR_CONNECT_LIST_DOMAINS_ACTIVE)
-                }
-                memory = {
-                    dom.name(): dom.memoryStats()
-                    for dom in conn.listAllDomains(VIR_CONNECT_LIST_DOMAINS_ACTIVE)
-                }
+        now, stats = self.get_stats()
+        states = [(name, _state_map.get(s.get('state.state'), "unknown")) for name, s in stats]
 
         states.sort(key=lambda x: x[0])
         max_len = 0
@@ -131,6 +175,29 @@ class Libvirt(BaseModule):
             if l > max_len:
                 max_len = l
 
+        usage = {}
+        if self.resource_rows > 0:
+            cpu_usage = self.cpu_usage(now, stats)
+            for name, s in stats:
+                # powered off domains have no CPU time
+                cpu = cpu_usage.get(name, 0)
+
+                # memory usage as seen by the guest, reported by the balloon driver
+                if 'balloon.unused' in s and 'balloon.available' in s:
+                    unused, available = s['balloon.unused'], s['balloon.available']
+                    ram = (1 - unused / available) * 100 if available else 0
+                    used = sizeof_fmt(div=1000.0)((available - unused) * 1000.0)
+                    total = sizeof_fmt(div=1000.0)(available * 1000.0)
+                    ram_txt = f"{used}/{total}"
+                else:
+                    ram, ram_txt = 0, '0B'
+
+                usage[name] = cpu, ram, ram_txt
+
+        # the sparklines of all the domains are rendered at once
+        keys = [(name, res) for name in usage for res in ('cpu', 'mem')]
+        sparks = dict(zip(keys, self.history.update(keys, [v for cpu, ram, _ in usage.values() for v in (cpu, ram)])))
+
         libvirt_info = ""
         for name, state in states:
             if libvirt_info:
@@ -142,43 +209,21 @@ class Libvirt(BaseModule):
                     + "\n"
             )
 
-            if self.resource_rows > 0:
-                if new_times.get(name) is None or self.times.get(name) is None:
-                    # one or both new and old times are None,
-                    # domain might have been just powered on or off
-                    cpu = 0
-                elif new_times[name]['vcpus'] != self.times[name]['vcpus']:
-                    # guest vCPUs number has changed, old data is invalid
-                    cpu = 0
-                else:
-                    cpu_delta = new_times[name]['cpu_time'] - self.times[name]['cpu_time']
-                    cpu = cpu_delta / (1e9 * new_times[name]['vcpus'] * self.refresh_interval) * 100
-
-                self.times = new_times
-
-                mem = memory.get(name, {})
-                # if the domain is powered off this will be (1-1/1)*100=0
-                unused, available = mem.get('unused', 1), mem.get('available', 1)
-                ram = (1 - unused / available) * 100
-
-                if name in memory:
-                    used = sizeof_fmt()((available - unused) * 1000.0, div=1000.0)
-                    total = sizeof_fmt()(available * 1000.0, div=1000.0)
-                    ram_txt = f"{used}/{total}"
-                else:
-                    ram_txt = '0B'
+            if name in usage:
+                cpu, ram, ram_txt = usage[name]
+                cpu_spark, ram_spark = sparks.get((name, 'cpu'), ''), sparks.get((name, 'mem'), '')
 
                 if self.resource_rows == 1:
                     libvirt_info += (
-                            create_bar(ceil(content_size[1] / 2), cpu, perc_fmt()(cpu), 'CPU', 'red')
+                            create_bar(ceil(content_size[1] / 2), cpu, perc_fmt()(cpu), 'CPU', 'red', cpu_spark)
                             +
-                            create_bar(floor(content_size[1] / 2), ram, ram_txt, 'Mem', 'green')
+                            create_bar(floor(content_size[1] / 2), ram, ram_txt, 'Mem', 'green', ram_spark)
                     )
                 else:
                     libvirt_info += (
-                            create_bar(content_size[1], cpu, perc_fmt()(cpu), 'CPU', 'red')
+                            create_bar(content_size[1], cpu, perc_fmt()(cpu), 'CPU', 'red', cpu_spark)
                             + "\n" +
-                            create_bar(content_size[1], ram, ram_txt, 'Mem', 'green')
+                            create_bar(content_size[1], ram, ram_txt, 'Mem', 'green', ram_spark)
                     )
 
         return libvirt_info
@@ -1,20 +1,16 @@
 from math import isnan
-from os import environ
 from typing import Any, Literal
 
 from pydashboard.containers import BaseModule
-from pydashboard.utils.bars import calc_bars_sizes, create_bar
+from pydashboard.utils.bars import BarHistory, calc_bars_sizes, create_bar
+from pydashboard.utils.nut import NUTClient, NUTError, parse_list
 from pydashboard.utils.types import Size
 
-environ['PWNLIB_NOTERM'] = 'true'
-from pwnlib.exception import PwnlibException
-from pwnlib.tubes.remote import remote
-
 
 class NUT(BaseModule):
     def __init__(self, *, title: str = None, host: str = "localhost", port: int = 3493, upsname: str = None,
                  username: str = None, password: str = None, timeout: int = 30, bars: Literal['auto', 0, 1, 2] = 0,
-                 **kwargs: Any):
+                 history: int = 0, history_style: Literal['block', 'braille'] = 'block', **kwargs: Any):
         """
         Displays information about UPSes connected to a Network Ups Tools server.
 
@@ -27,10 +23,15 @@ class NUT(BaseModule):
             password: NUT password
             timeout: Connection timeout seconds
             bars: whether to show status bars on 1 or 2 lines or automatically ('auto', 0)
+            history: Width in characters of the load and battery history shown before each bar, 0 to disable. Each
+                     character is a sample (two with `braille` style), so the history covers
+                     `history * refresh_interval` seconds
+            history_style: Draw the history with block elements (8 levels) or braille patterns (4 levels, twice the
+                           samples)
             **kwargs: See [BaseModule](../containers/basemodule.md)
         """
         super().__init__(title=title, host=host, port=port, upsname=upsname, username=username, password=password,
-                         timeout=timeout, bars=bars, **kwargs)
+                         timeout=timeout, bars=bars, history=history, history_style=history_style, **kwargs)
         self.username = username
         self.password = password
         self.upsname = upsname
@@ -38,6 +39,7 @@ class NUT(BaseModule):
         self.port = port
         self.timeout = timeout
         self.bars = bars
+        self.history = BarHistory(history, history_style)
         self.__model_as_title = title is None and upsname is not None
 
     def __post_init__(self, content_size: Size):
@@ -50,17 +52,29 @@ class NUT(BaseModule):
             return '[red]Connection timed out[/red]'
         except ConnectionRefusedError:
             return '[red]Offline or connection refused[/red]'
-        except RuntimeError as e:
-            return f"[red]{e}[/red]"
-        except PwnlibException as e:
+        except (RuntimeError, OSError) as e:
             return f"[red]{e}[/red]"
 
         if self.__model_as_title:
             self.border_title = status[self.upsname]['friendly_name']
 
-        return '\n'.join(self.render_ups(data, content_size[1]) for _, data in status.items())
+        # the sparklines of all the UPSes are rendered at once
+        keys = [(ups, bar) for ups in status for bar in ('load', 'battery')]
+        values = [v for data in status.values() for v in self.bar_values(data)]
+        sparks = dict(zip(keys, self.history.update(keys, values)))
+
+        return '\n'.join(self.render_ups(data, content_size[1], sparks[ups, 'load'], sparks[ups, 'battery'])
+                         for ups, data in status.items())
 
-    def render_ups(self, data, content_width):
+    @staticmethod
+    def bar_values(data) -> tuple[float | None, float | None]:
+        """Load and battery charge percent, `None` if not available"""
+        if 'error' in data:
+            return None, None
+        ups_load = int(data.get('ups-load', -1))
+        return ups_load if ups_load > -1 else None, float(data.get('battery-charge', 'nan'))
+
+    def render_ups(self, data, content_width, load_spark='', batt_spark=''):
         friendly_name = data['friendly_name']
         if 'error' in data:
             return f"[red]{friendly_name}\n{data['error']}[/red]"
@@ -92,14 +106,14 @@ class NUT(BaseModule):
 
         load_power = f'{load_power}W ' if load_power is not None else ''
         if ups_load > -1:
-            load_bar = create_bar(self.lbar, ups_load, f'{load_power}{ups_load}%', '', load_color)
+            load_bar = create_bar(self.lbar, ups_load, f'{load_power}{ups_load}%', '', load_color, load_spark)
         else:
             load_bar = load_power
 
         battery_runtime = f'{battery_runtime}m ' if not isnan(battery_runtime) else ''
         if not isnan(battery_charge):
             batt_bar = create_bar(self.rbar, battery_charge,
-                                  f'{battery_runtime}{battery_charge}%', '', batt_color)
+                                  f'{battery_runtime}{battery_charge}%', '', batt_color, batt_spark)
         else:
             batt_bar = battery_runtime
 
@@ -122,61 +136,32 @@ class NUT(BaseModule):
         )
 
     def get(self):
-        with remote(self.host, self.port, timeout=self.timeout) as sock:
-            self.login(sock)
+        client = NUTClient.get(self.host, self.port, self.username, self.password, self.timeout)
 
+        if self.upsname:
+            # ask for the UPS list and the variables together, a single round trip is needed
+            ups_list, ups_vars = client.request("LIST UPS", f"LIST VAR {self.upsname}")
             try:
-                ups_list = self.get_ups_names(sock)
-            except RuntimeError as e:
-                if self.upsname:
-                    # cannot get friendly name, at least try to get UPS data
-                    ups_list = {self.upsname: self.upsname}
-                else:
-                    raise e
-
-            if self.upsname:
-                result = {
-                    self.upsname: self.get_ups_vars(sock, self.upsname) | {'friendly_name': ups_list[self.upsname]}
-                }
-            else:
-                result = {
-                    k: self.get_ups_vars(sock, k) | {'friendly_name': v}
-                    for k, v in ups_list.items()
-                }
-
-            sock.sendline(b'LOGOUT')
-            return result
-
-    def login(self, sock):
-        if self.username is not None:
-            sock.sendline(f"USERNAME {self.username}".encode())
-            result = sock.recvline(False).decode()
-            if result[:2] != "OK":
-                raise RuntimeError(result)
-        if self.password is not None:
-            sock.sendline(f"PASSWORD \"{self.password}\"".encode())
-            result = sock.recvline(False).decode()
-            if result[:2] != "OK":
-                raise RuntimeError(result)
+                friendly_name = parse_list(ups_list, 1)[self.upsname]
+            except (NUTError, KeyError):
+                # cannot get friendly name, at least try to get UPS data
+                friendly_name = self.upsname
+            ups_list = {self.upsname: friendly_name}
+            ups_vars = {self.upsname: ups_vars if isinstance(ups_vars, NUTError) else parse_list(ups_vars, 2)}
+        else:
+            ups_list = client.list_ups()
+            ups_vars = client.list_vars(*ups_list)
 
-    @staticmethod
-    def get_ups_vars(sock, upsname):
-        sock.sendline(f"LIST VAR {upsname}".encode())
-        result = sock.recvline(False).decode()
-        if "BEGIN LIST VAR" not in result:
-            return {'error': result}
-        result = sock.recvuntil(f"END LIST VAR {upsname}\n".encode()).decode()
-        return {l[0].replace('.', '-'): l[1].strip('"') for l in
-                [l.split(maxsplit=1) for l in result.replace(f'VAR {upsname} ', '').splitlines()[:-1]]}
+        return {
+            k: self.format_vars(ups_vars[k]) | {'friendly_name': v}
+            for k, v in ups_list.items()
+        }
 
     @staticmethod
-    def get_ups_names(sock):
-        sock.sendline(b"LIST UPS")
-        result = sock.recvline(False).decode()
-        if "BEGIN LIST UPS" not in result:
-            raise RuntimeError(result)
-        result = sock.recvuntil(b"END LIST UPS\n").decode().splitlines()[:-1]
-        return {l[1]: l[2].strip('"') for l in [l.split(maxsplit=2) for l in result]}
+    def format_vars(ups_vars):
+        if isinstance(ups_vars, NUTError):
+            return {'error': str(ups_vars)}
+        return {k.replace('.', '-'): v for k, v in ups_vars.items()}
 
 
 widget = NUT
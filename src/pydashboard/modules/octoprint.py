@@ -7,11 +7,13 @@ from benedict import benedict
 from octorest import OctoRest
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.http import Session
 from pydashboard.utils.units import duration_fmt
 
 
 class OctoPrint(BaseModule):
-    def __init__(self, *, host: str, token: str, port: int = 80, scheme: str = 'http', **kwargs: Any):
+    def __init__(self, *, host: str, token: str, port: int = 80, scheme: str = 'http', timeout: float = 30,
+                 http2: bool = False, **kwargs: Any):
         """
 
         Args:
@@ -19,6 +21,8 @@ class OctoPrint(BaseModule):
             token: OctoPrint API token
             port: OctoPrint server port
             scheme: http or https
+            timeout: Request timeout in seconds
+            http2: Use HTTP/2 if supported by the server, requires `httpx[http2]`
             **kwargs: See [BaseModule](../containers/basemodule.md)
 
         !!! note
@@ -28,12 +32,16 @@ class OctoPrint(BaseModule):
         for k in ['subtitle', 'subtitle_align', 'subtitle_background', 'subtitle_color', 'subtitle_style']:
             if k in kwargs:
                 del kwargs[k]
-        super().__init__(host=host, token=token, port=port, scheme=scheme, **kwargs)
+        super().__init__(host=host, token=token, port=port, scheme=scheme, timeout=timeout, http2=http2,
+                         **kwargs)
         self.host = host
         self.token = token
         self.port = port
         self.scheme = scheme
+        self.timeout = timeout
+        self.http2 = http2
         self.url = f'{scheme}://{host}:{port}'
+        self.client = None
         self.styles.border_subtitle_align = 'left'
 
         def _check_response(_, response: 'requests.Response'):
@@ -54,7 +62,12 @@ class OctoPrint(BaseModule):
     def __call__(self):
         out = ''
         try:
-            client = OctoRest(url=self.url, apikey=self.token)
+            if self.client is None:
+                # OctoRest stores the API key in the session headers, so it gets its own session instead of the
+                # shared one, kept between refreshes
+                self.client = OctoRest(url=self.url, apikey=self.token,
+                                       session=Session(timeout=self.timeout, http2=self.http2))
+            client = self.client
             job_info = benedict(client.job_info(), keyattr_dynamic=True)
             conn_info = benedict(client.connection_info(), keyattr_dynamic=True)
             printer = benedict(client.printer() if conn_info.current.port else {}, keyattr_dynamic=True)
@@ -1,10 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Any
 
 import proxmoxer.core
+from numpy import array
 from pandas import DataFrame
 from proxmoxer import ProxmoxAPI
 
 from pydashboard.containers import TableModule
+from pydashboard.utils.datasource import DataSource
 from pydashboard.utils.units import duration_fmt, perc_fmt, sizeof_fmt, speedof_fmt
 
 colors_map = {
@@ -21,6 +25,11 @@ def colorize(state):
     return f'[{c}]{state}[/{c}]'
 
 
+# shared by all the proxmox and proxmox_storage widgets, so the number of threads does not grow with the number of
+# widgets
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ProxmoxWorker')
+
+
 def colorize_percentage(pct):
     _pct = pct
     if isinstance(_pct, str):
@@ -88,7 +97,7 @@ _human = {
     "netout"   : speedof_fmt(),
     "swap"     : sizeof_fmt(),
     "swappct"  : perc_fmt(100.0),
-    "uptime"   : lambda x: duration_fmt(x) if x > 0 else '',
+    "uptime"   : lambda x: duration_fmt(x) if x != '' and x > 0 else '',
     "vmid"     : lambda x: x if x >= 0 else '',
 }
 
@@ -130,39 +139,43 @@ _names_map = {
 }
 
 
-def normalize_records(records: list[dict]) -> list[dict]:
-    all_keys = {k for record in records for k in record}
-
-    normalized = []
-    for record in records:
-        new_record = {}
-        for key in all_keys:
-            value = record.get(key)
-            if isinstance(value, str):
-                new_record[key] = value
-            elif isinstance(value, int):
-                new_record[key] = value
-            elif isinstance(value, float):
-                new_record[key] = value
-            else:
-                new_record[key] = ""
-        normalized.append(new_record)
+_scalar_types = frozenset({str, int, float, bool})
 
-    return normalized
+
+def normalize_columns(records: list[dict]) -> dict[str, list]:
+    """
+    Turn the records returned by the API into columns in a single pass.
+
+    Missing values and values that are not strings or numbers are replaced by `""`.
+    """
+    n = len(records)
+    columns: dict[str, list] = {}
+
+    for i, record in enumerate(records):
+        for key, value in record.items():
+            if type(value) in _scalar_types:
+                try:
+                    columns[key][i] = value
+                except KeyError:
+                    # preallocated with the sentinel, so rows without this key need no work
+                    columns[key] = [""] * n
+                    columns[key][i] = value
+            elif key not in columns:
+                columns[key] = [""] * n
+
+    return columns
 
 
 def records_to_df(records: list[dict]) -> DataFrame:
-    normalized = normalize_records(records)
-    df = DataFrame.from_records(normalized)
+    columns = normalize_columns(records)
 
-    # Per ogni colonna, se contiene misti (int/""), usa object dtype
-    # altrimenti pandas può fare inferenza corretta
-    for col in df.columns:
-        sample = next((v for v in df[col] if v != ""), None)
+    # columns mixing integers and "" use object dtype, otherwise pandas can infer the right type
+    for key, column in columns.items():
+        sample = next((v for v in column if v != ""), None)
         if isinstance(sample, int):
-            df[col] = df[col].astype(object)
+            columns[key] = array(column, dtype=object)
 
-    return df
+    return DataFrame(columns)
 
 
 class Proxmox(TableModule):
@@ -170,6 +183,7 @@ class Proxmox(TableModule):
                 'cpu'   : colorize_percentage}
     column_names = _names_map
     justify = _justify
+    row_key = ('node', 'vmid')
 
     def __init__(self, *, token_name: str, token_secret: str,
                  host: str = "localhost", user: str = "root@pam", verify_ssl: bool = True,
@@ -179,7 +193,7 @@ class Proxmox(TableModule):
                                        'mem', 'mempct', 'maxmem',
                                        'swap', 'swappct', 'maxswap',
                                        'disk', 'diskpct', 'maxdisk'),
-                 human_readable: bool = True, **kwargs: Any):
+                 human_readable: bool = True, use_cluster_resources: bool = False, **kwargs: Any):
         """
         Proxmox VM and container status.
         By default, are sorted by node and for each node VMs and Containers are sorted by id.
@@ -190,8 +204,21 @@ class Proxmox(TableModule):
             token_name: Proxmox token name
             token_secret: Proxmox token secret
             verify_ssl: Whether to check SSL certificate validity
+            use_cluster_resources: Get nodes, VMs and containers with a single request to `/cluster/resources`
+                instead of querying each node, see [below](#cluster-resources)
             **kwargs: See [TableModule](../containers/tablemodule.md)
 
+        Widgets connecting to the same host with the same credentials share their requests, including
+        [proxmox_storage](proxmox_storage.md) widgets: a response is reused by the other widgets for `refresh_interval`
+        seconds, so two widgets showing different columns of the same cluster query it only once.
+
+        # Cluster resources
+        By default, every refresh lists the nodes and then requests containers and VMs of all the nodes concurrently.
+        With `use_cluster_resources` a single request is needed regardless of the number of nodes, but
+        `/cluster/resources` returns fewer attributes: `diskread` and `diskwrite` are available for both VMs and
+        containers, while `maxswap`, `swap`, `swappct`, `pid`, `pressure*`, `memhost`, `ssl_fingerprint` and `id` (for
+        nodes) are not.
+
         # Available columns
         Source and attribute meaning: [PVE Docs: Nodes](https://pve.proxmox.com/pve-docs/api-viewer/#/nodes)
         Attributes with `*` are not part of the official API or its behavior is slightly different.
@@ -238,54 +265,98 @@ class Proxmox(TableModule):
 
         """
         super().__init__(host=host, user=user, token_name=token_name, token_secret=token_secret, verify_ssl=verify_ssl,
-                         sort=sort, columns=columns, human_readable=human_readable, **kwargs)
+                         sort=sort, columns=columns, human_readable=human_readable,
+                         use_cluster_resources=use_cluster_resources, **kwargs)
         self.host = host
         self.user = user
         self.token_name = token_name
         self.token_secret = token_secret
         self.verify_ssl = verify_ssl
         self.humanize = _human if human_readable else None
+        self.use_cluster_resources = use_cluster_resources
 
     def __post_init__(self):
-        self.proxmox = ProxmoxAPI(host=self.host, user=self.user, token_name=self.token_name,
-                                  token_value=self.token_secret, verify_ssl=self.verify_ssl,
-                                  timeout=max(self.refresh_interval-1, 0))
+        self.source = proxmox_source(self.host, self.user, self.token_name, self.token_secret, self.verify_ssl,
+                                     timeout=max(self.refresh_interval-1, 0))
+
+    def fetch(self, *path):
+        """GET `path` through the shared data source"""
+        return self.source.fetch(path, lambda proxmox: proxmox(path).get(), self.refresh_interval)
+
+    @staticmethod
+    def node_row(node):
+        # responses are shared with other widgets, never modify them
+        node = dict(node)
+        # Probably not the best way, but allows to sort hosts and vms having each host together with its vms
+        node['vmid'] = -1
+        node['combined_name'] = node['node']
+        # offline nodes only report their name and status
+        node['cpus'] = node.get('maxcpu', '')
+        try:
+            node['mempct'] = node['mem'] / node['maxmem']
+            node['diskpct'] = node['disk'] / node['maxdisk']
+        except (ZeroDivisionError, KeyError):
+            pass
+        return node
+
+    @staticmethod
+    def vm_row(vm, node_name):
+        vm = dict(vm)
+        vm['node'] = node_name
+        vm['combined_name'] = f"{vm['vmid']} ({vm['name']})"
+        if 'cpus' in vm:
+            vm['maxcpu'] = vm['cpus']
+        else:
+            vm['cpus'] = vm['maxcpu']
+        vm['mempct'] = vm['mem'] / vm['maxmem']
+        try:
+            vm['diskpct'] = vm['disk'] / vm['maxdisk']
+        except ZeroDivisionError:
+            pass
 
-    def __call__(self):
+        try:
+            vm['swappct'] = vm['swap'] / vm['maxswap']
+        except (ZeroDivisionError, KeyError):
+            pass
+        return vm
+
+    def get_cluster_rows(self):
+        rows = []
+        for res in self.fetch('cluster', 'resources'):
+            if res['type'] == 'node':
+                rows.append(self.node_row(res))
+            elif res['type'] in ('lxc', 'qemu'):
+                rows.append(self.vm_row(res, res['node']))
+        return rows
+
+    def get_nodes_rows(self):
         rows = []
+        nodes = self.fetch('nodes')
+        # containers and VMs of all the nodes are requested concurrently, so refresh time does not grow with the
+        # number of nodes
+        futures = []
+        for node in nodes:
+            futures += [(node['node'], executor.submit(partial(self.fetch, 'nodes', node['node'], hv)))
+                        for hv in ('lxc', 'qemu')]
+            rows.append(self.node_row(node))
+        for node_name, future in futures:
+            rows.extend(self.vm_row(vm, node_name) for vm in future.result())
+        return rows
+
+    def __call__(self):
         try:
-            for node in self.proxmox.nodes.get():
-                # Probably not the best way, but allows to sort hosts and vms having each host together with its vms
-                node['vmid'] = -1
-                node['combined_name'] = node['node']
-                node['cpus'] = node['maxcpu']
-                node['mempct'] = node['mem'] / node['maxmem']
-                try:
-                    node['diskpct'] = node['disk'] / node['maxdisk']
-                except ZeroDivisionError:
-                    pass
-                rows.append(node)
-
-                _node = self.proxmox.nodes(node['node'])
-                for hv in [_node.lxc, _node.qemu]:
-                    for vm in hv.get():
-                        vm['node'] = node['node']
-                        vm['combined_name'] = f"{vm['vmid']} ({vm['name']})"
-                        vm['maxcpu'] = vm['cpus']
-                        vm['mempct'] = vm['mem'] / vm['maxmem']
-                        try:
-                            vm['diskpct'] = vm['disk'] / vm['maxdisk']
-                        except ZeroDivisionError:
-                            pass
-
-                        try:
-                            vm['swappct'] = vm['swap'] / vm['maxswap']
-                        except (ZeroDivisionError, KeyError):
-                            pass
-                        rows.append(vm)
+            if self.use_cluster_resources:
+                rows = self.get_cluster_rows()
+            else:
+                rows = self.get_nodes_rows()
             self.reset_settings('border_subtitle')
             self.reset_settings('styles.border_subtitle_color')
-            return records_to_df(rows)
+            df = records_to_df(rows)
+            # attributes not reported by any row (e.g. swap without containers or with `/cluster/resources`)
+            for col in self.columns or []:
+                if col not in df:
+                    df[col] = ''
+            return df
 
         except proxmoxer.core.ResourceException as e:
             self.border_subtitle = f"{e.status_code} {e.status_message}: {e.content}".strip()
@@ -301,4 +372,14 @@ class Proxmox(TableModule):
             self.logger.error('TimeoutError')
 
 
+def proxmox_source(host, user, token_name, token_secret, verify_ssl, timeout) -> DataSource:
+    """
+    Data source shared by the Proxmox widgets connecting to the same host with the same credentials and timeout. The
+    timeout is set on the client, so widgets with different timeouts can't share it.
+    """
+    return DataSource.get('proxmox', host, (user, token_name, token_secret, verify_ssl, timeout),
+                          partial(ProxmoxAPI, host=host, user=user, token_name=token_name, token_value=token_secret,
+                                  verify_ssl=verify_ssl, timeout=timeout))
+
+
 widget = Proxmox
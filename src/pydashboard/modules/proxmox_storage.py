@@ -1,10 +1,11 @@
+from functools import partial
 from typing import Any
 
 import proxmoxer.core
 from pandas import DataFrame
-from proxmoxer import ProxmoxAPI
 
 from pydashboard.containers import TableModule
+from pydashboard.modules.proxmox import executor, proxmox_source
 from pydashboard.utils.units import perc_fmt, sizeof_fmt
 
 
@@ -68,13 +69,14 @@ class ProxmoxStorage(TableModule):
     colorize = {'used_fraction': colorize_percentage}
     column_names = _names_map
     justify = _justify
+    row_key = ('node', 'storage')
 
     def __init__(self, *, token_name: str, token_secret: str,
                  host: str = "localhost", user: str = "root@pam", verify_ssl: bool = True,
                  sort: str | tuple[str, bool] | list[str | tuple[str, bool]] = ('node', 'storage'),
                  columns: list[str] = ('node', 'storage', 'avail', 'used', 'used_fraction', 'total', 'type', 'content',
                                        'active', 'enabled', 'shared'),
-                 human_readable: bool = True, **kwargs: Any):
+                 human_readable: bool = True, use_cluster_resources: bool = False, **kwargs: Any):
         """
         Proxmox VM and container status.
         By default, are sorted by node and for each node VMs and Containers are sorted by id.
@@ -85,36 +87,82 @@ class ProxmoxStorage(TableModule):
             token_name: Proxmox token name
             token_secret: Proxmox token secret
             verify_ssl: Whether to check SSL certificate validity
+            use_cluster_resources: Get the storages of all the nodes with a single request to `/cluster/resources`
+                instead of querying each node concurrently. `/cluster/resources` does not report `enabled` and
+                reports `active` only as available or not, `enabled` is left empty.
             **kwargs: See [TableModule](../containers/tablemodule.md)
 
+        Requests are shared with the other [proxmox](proxmox.md) and proxmox_storage widgets connecting to the same
+        host with the same credentials.
+
         # Available columns
         Source and attribute meaning: [PVE Docs: Nodes](https://pve.proxmox.com/pve-docs/api-viewer/#/nodes)
         Attributes with `*` are not part of the official API or its behavior is slightly different.
         """
         super().__init__(host=host, user=user, token_name=token_name, token_secret=token_secret, verify_ssl=verify_ssl,
-                         sort=sort, columns=columns, human_readable=human_readable, **kwargs)
+                         sort=sort, columns=columns, human_readable=human_readable,
+                         use_cluster_resources=use_cluster_resources, **kwargs)
         self.host = host
         self.user = user
         self.token_name = token_name
         self.token_secret = token_secret
         self.verify_ssl = verify_ssl
         self.humanize = _human if human_readable else None
+        self.use_cluster_resources = use_cluster_resources
 
     def __post_init__(self):
-        self.proxmox = ProxmoxAPI(host=self.host, user=self.user, token_name=self.token_name,
-                                  token_value=self.token_secret, verify_ssl=self.verify_ssl,
-                                  timeout=self.refresh_interval)
+        self.source = proxmox_source(self.host, self.user, self.token_name, self.token_secret, self.verify_ssl,
+                                     timeout=max(self.refresh_interval-1, 0))
 
-    def __call__(self):
+    def fetch(self, *path):
+        """GET `path` through the shared data source"""
+        return self.source.fetch(path, lambda proxmox: proxmox(path).get(), self.refresh_interval)
+
+    def get_cluster_rows(self):
         rows = []
+        # the whole list is requested and filtered here, so the request is shared with proxmox widgets
+        for res in self.fetch('cluster', 'resources'):
+            if res['type'] != 'storage':
+                continue
+            used, total = res.get('disk', 0), res.get('maxdisk', 0)
+            rows.append({
+                'node'         : res['node'],
+                'storage'      : res['storage'],
+                'avail'        : total - used,
+                'used'         : used,
+                'used_fraction': used / total if total else 0.0,
+                'total'        : total,
+                'type'         : res.get('plugintype', ''),
+                'content'      : res.get('content', ''),
+                'active'       : int(res.get('status') == 'available'),
+                'shared'       : res.get('shared', 0),
+            })
+        return rows
+
+    def get_nodes_rows(self):
+        rows = []
+        # storages of all the nodes are requested concurrently, so refresh time does not grow with the number of nodes
+        futures = [(node['node'], executor.submit(partial(self.fetch, 'nodes', node['node'], 'storage')))
+                   for node in self.fetch('nodes')]
+        for node_name, future in futures:
+            for storage in future.result():
+                # responses are shared with other widgets, never modify them
+                rows.append({**storage, 'node': node_name})
+        return rows
+
+    def __call__(self):
         try:
-            for node in self.proxmox.nodes.get():
-                for storage in self.proxmox.nodes(node['node']).storage.get():
-                    storage['node'] = node['node']
-                    rows.append(storage)
+            if self.use_cluster_resources:
+                rows = self.get_cluster_rows()
+            else:
+                rows = self.get_nodes_rows()
             self.reset_settings('border_subtitle')
             self.reset_settings('styles.border_subtitle_color')
-            return DataFrame.from_records(rows)
+            df = DataFrame.from_records(rows)
+            for col in self.columns or []:
+                if col not in df:
+                    df[col] = ''
+            return df
 
         except proxmoxer.core.ResourceException as e:
             self.border_subtitle = f"{e.status_code} {e.status_message}: {e.content}".strip()
@@ -146,6 +146,7 @@ def colorize(state):
 class QBitTorrent(TableModule):
     justify = _justify
     colorize = {'state': colorize}
+    row_key = 'hash'
 
     def __init__(self, *, host: str, username: str, password: str, port: int = 8080, scheme: str = 'http',
                  sort: str | tuple[str, bool] | list[str | tuple[str, bool]] = ('downloaded', False),
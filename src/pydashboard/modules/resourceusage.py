@@ -1,18 +1,25 @@
-from subprocess import PIPE, run
-from typing import Any
+from typing import Any, Literal
 
 import psutil as ps
-from psutil._common import bytes2human as b2h, shwtemp
+from psutil._common import bytes2human as b2h
+
+try:
+    from psutil._common import shwtemp
+except ImportError:
+    # moved in psutil 7.1
+    from psutil._ntuples import shwtemp
 
 from pydashboard.containers import BaseModule
-from pydashboard.utils.bars import create_bar
-from pydashboard.utils.numbers import safe_float_cast
+from pydashboard.utils.bars import BarHistory, create_bar
+from pydashboard.utils.gpu import GPUSampler
+from pydashboard.utils.procfs import ProcSampler
 from pydashboard.utils.types import Size
 
 
 class ResourceUsage(BaseModule):
     def __init__(self, *, cpu_combined: bool = True, show_cpu: bool = True, show_mem: bool = True,
-                 show_swp: bool = True, show_gpu: bool = True, **kwargs: Any):
+                 show_swp: bool = True, show_gpu: bool = True, history: int = 0,
+                 history_style: Literal['block', 'braille'] = 'block', **kwargs: Any):
         """
 
         Args:
@@ -21,39 +28,98 @@ class ResourceUsage(BaseModule):
             show_mem: Show RAM usage
             show_swp: Show swap usage
             show_gpu: Show GPU usage
+            history: Width in characters of the usage history shown before each bar, 0 to disable. Each character is a
+                     sample (two with `braille` style), so the history covers `history * refresh_interval` seconds
+            history_style: Draw the history with block elements (8 levels) or braille patterns (4 levels, twice the
+                           samples)
             **kwargs: See [BaseModule](../containers/basemodule.md)
         """
         super().__init__(cpu_combined=cpu_combined, show_cpu=show_cpu, show_mem=show_mem, show_swp=show_swp,
-                         show_gpu=show_gpu, **kwargs)
+                         show_gpu=show_gpu, history=history, history_style=history_style, **kwargs)
         self.cpu_combined = cpu_combined
         self.show_cpu = show_cpu
         self.show_mem = show_mem
         self.show_swp = show_swp
         self.show_gpu = show_gpu
+        self.history = BarHistory(history, history_style)
+        self.sampler: ProcSampler | None = None
+
+    def __post_init__(self):
+        try:
+            self.sampler = ProcSampler()
+        except OSError as e:
+            # not on Linux, use psutil
+            self.logger.debug('Cannot read /proc, using psutil: {}', e)
 
     def __call__(self, content_size: Size):
         bars = []
 
+        if self.sampler is not None:
+            self.sampler.sample()
+
         if self.show_cpu:
             bars.extend(self.get_cpu_data(self.cpu_combined))
 
         if self.show_mem:
-            vmem = ps.virtual_memory()
-            bars.append([vmem.percent, f'{b2h(vmem.used)}/{b2h(vmem.total)}', 'Mem', 'green'])
+            if self.sampler is not None:
+                perc, used, total = self.sampler.virtual_memory()
+            else:
+                vmem = ps.virtual_memory()
+                perc, used, total = vmem.percent, vmem.used, vmem.total
+            bars.append([perc, f'{b2h(used)}/{b2h(total)}', 'Mem', 'green'])
 
         if self.show_swp:
-            smem = ps.swap_memory()
-            bars.append([smem.percent, f'{b2h(smem.used)}/{b2h(smem.total)}', 'Swp', 'green'])
+            if self.sampler is not None:
+                perc, used, total = self.sampler.swap_memory()
+            else:
+                smem = ps.swap_memory()
+                perc, used, total = smem.percent, smem.used, smem.total
+            bars.append([perc, f'{b2h(used)}/{b2h(total)}', 'Swp', 'green'])
 
         if self.show_gpu:
             bars.extend(self.get_gpu_data())
 
+        sparks = self.history.update([pre_txt for _, _, pre_txt, _ in bars], [perc for perc, _, _, _ in bars])
+
         return '\n'.join([create_bar(max_w=content_size[1],
                                      perc=perc, text=text,
-                                     pre_txt=pre_txt, color=color) for perc, text, pre_txt, color in bars])
+                                     pre_txt=pre_txt, color=color, spark=spark)
+                          for (perc, text, pre_txt, color), spark in zip(bars, sparks)])
+
+    def get_cpu_data(self, cpu_combined):
+        if self.sampler is None:
+            return self.get_cpu_data_psutil(cpu_combined)
+
+        bars = []
+        if cpu_combined:
+            perc = self.sampler.cpu_percent()
+            freq = self.sampler.cpu_freq()
+            temp = self.sampler.package_temperature()
+
+            text = f'{round(perc, int(perc < 100))}%'
+            if freq is not None:
+                text += f' {round(freq):>4}MHz'
+            if temp is not None:
+                text += f' {round(temp)}°C'
+            bars.append([perc, text, 'CPU', 'red'])
+        else:
+            freq = self.sampler.cpu_freq(percpu=True)
+            temp = self.sampler.core_temperatures()
+
+            for i, p in enumerate(self.sampler.cpu_percent(percpu=True).tolist()):
+                text = f'{round(p, int(p < 100))}%'
+                if freq is not None and i < len(freq):
+                    text += f' {round(freq[i]):>4}MHz'
+                t = temp.get(i)
+                if t is not None:
+                    text += f' {round(t)}°C'
+                else:
+                    text += '  N/A'
+                bars.append([p, text, str(i), 'red'])
+        return bars
 
     @staticmethod
-    def get_cpu_data(cpu_combined):
+    def get_cpu_data_psutil(cpu_combined):
         bars = []
 
         if cpu_combined:
@@ -82,36 +148,24 @@ class ResourceUsage(BaseModule):
         return bars
 
     def get_gpu_data(self):
-        """Extracted from GPUtil https://github.com/anderskm/gputil/tree/master"""
-
-        # Get ID, processing and memory utilization for all GPUs
-        try:
-            p = run(["nvidia-smi", "--query-gpu=index,utilization.gpu,memory.total,memory.used,temperature.gpu",
-                     "--format=csv,noheader,nounits"], stdout=PIPE).stdout.decode()
-        except FileNotFoundError:
+        # the sampler runs in background, here only its last sample is read
+        sampler = GPUSampler.get(self.refresh_interval or 1)
+        if sampler is None:
             return [[None, '', 'nvidia-smi not found', 'red']]
-        except Exception as e:
-            return [[None, '', str(e), 'red']]
 
-        if 'Failed to initialize NVML' in p:
-            self.logger.error(p)
-            return [[None, '', 'GPU: NVML Error', 'red']]
+        if sampler.error is not None:
+            self.logger.error(sampler.error)
+            if 'NVML' in sampler.error:
+                return [[None, '', 'GPU: NVML Error', 'red']]
+            return [[None, '', sampler.error, 'red']]
 
         bars = []
-        for n, line in enumerate(p.splitlines()):
-            vals = line.split(', ')
-            try:
-                gpu_id = int(vals[0])
-            except ValueError:
-                gpu_id = n
-            gpu_util = safe_float_cast(vals[1])
-            mem_total = safe_float_cast(vals[2])
-            mem_used = safe_float_cast(vals[3])
-            memory_util = (mem_used / mem_total) * 100
-            temp_gpu = safe_float_cast(vals[4])
-            bars.append([gpu_util, f'{round(gpu_util, int(gpu_util < 100))}% {temp_gpu}°C', f'GPU{gpu_id}', 'red'])
-            bars.append([memory_util, f'{(round(mem_used / 1024, 1))}G/{round(mem_total / 1024, 1)}G', f'Mem{gpu_id}',
-                         'green'])
+        for gpu in sampler.latest:
+            memory_util = (gpu.memory_used / gpu.memory_total) * 100
+            bars.append([gpu.utilization, f'{round(gpu.utilization, int(gpu.utilization < 100))}% {gpu.temperature}°C',
+                         f'GPU{gpu.index}', 'red'])
+            bars.append([memory_util, f'{(round(gpu.memory_used / 1024, 1))}G/{round(gpu.memory_total / 1024, 1)}G',
+                         f'Mem{gpu.index}', 'green'])
         return bars
 
 
@@ -1,11 +1,11 @@
 from typing import Any
 from urllib.parse import quote
 
-import requests
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 from rich.text import Text
 
 from pydashboard.containers import BaseModule
+from pydashboard.utils.http import get_session
 
 
 class Weather(BaseModule):
@@ -14,7 +14,7 @@ class Weather(BaseModule):
     def __init__(self, location: str, language: str = None, narrow: bool = False, metric: bool = None,
                  speed_in_m_s: bool = False, today_forecast: bool = False, tomorrow_forecast: bool = False,
                  quiet: bool = True, show_city: bool = False, no_colors: bool = False, console_glyphs: bool = False,
-                 **kwargs: Any):
+                 timeout: float = 30, http2: bool = False, **kwargs: Any):
         """
         See [wttr.in/:help](https://wttr.in/:help)
 
@@ -30,6 +30,8 @@ class Weather(BaseModule):
             show_city: Super quiet: hide city name. Requires "quiet=True"
             no_colors: Disable colored output
             console_glyphs: If true disables use of advanced terminal features like emojis.
+            timeout: Request timeout in seconds
+            http2: Use HTTP/2 if supported by the server, requires `httpx[http2]`
             **kwargs: See [BaseModule](../containers/basemodule.md)
 
 
@@ -58,7 +60,8 @@ class Weather(BaseModule):
         """
         super().__init__(location=location, language=language, narrow=narrow, metric=metric, speed_in_m_s=speed_in_m_s,
                          today_forecast=today_forecast, tomorrow_forecast=tomorrow_forecast, quiet=quiet,
-                         show_city=show_city, no_colors=no_colors, console_glyphs=console_glyphs, **kwargs)
+                         show_city=show_city, no_colors=no_colors, console_glyphs=console_glyphs, timeout=timeout,
+                         http2=http2, **kwargs)
         self.location = quote(location)
         self.language = language
         self.narrow = narrow
@@ -70,6 +73,8 @@ class Weather(BaseModule):
         self.show_city = show_city
         self.no_colors = no_colors
         self.console_glyphs = console_glyphs
+        self.timeout = timeout
+        self.http2 = http2
 
         # noinspection HttpUrlsUsage
         self.url = 'http://wttr.in/' + self.location + '?AF'
@@ -108,7 +113,8 @@ class Weather(BaseModule):
 
     def __call__(self):
         try:
-            response = requests.get(self.url, headers=self.headers)
+            response = get_session(self.url, http2=self.http2).get(self.url, headers=self.headers,
+                                                                   timeout=self.timeout)
             if response.status_code == 200:
                 self.__cache = Text.from_ansi(response.text)
                 self.reset_settings('border_subtitle')
@@ -117,7 +123,7 @@ class Weather(BaseModule):
                 self.border_subtitle = f'{response.status_code} {response.reason}'
                 self.styles.border_subtitle_color = 'red'
                 self.logger.error(response.text)
-        except ConnectionError as e:
+        except (ConnectionError, Timeout) as e:
             self.logger.critical(str(e))
 
         return self.__cache
@@ -3,7 +3,6 @@ import re
 import sys
 from argparse import ArgumentParser, BooleanOptionalAction
 from functools import wraps
-from importlib import import_module
 from pathlib import Path
 from threading import Event, Thread
 from typing import Any, Type, cast
@@ -28,6 +27,8 @@ if not __package__:
     sys.path.insert(0, package_source_path)
 
 from .containers import ErrorModule, GenericModule as Module
+from .utils.registry import ModuleRegistry
+from .utils.scheduler import Scheduler
 from .utils.ssh import SessionManager
 from .utils.types import Coordinates
 
@@ -38,17 +39,24 @@ class MainApp(App):
     signal = Event()
     config: dict
     ready_hooks = {}
-    modules_threads = []
+    scheduler: Scheduler | None = None
 
     def __init__(self, config: dict, logger: '_logger.Logger', driver_class: Type[Driver] | None = None,
-                 css_path: CSSPathType | None = None, watch_css: bool = False, ansi_color: bool = False):
+                 css_path: CSSPathType | None = None, watch_css: bool = False, ansi_color: bool = False,
+                 profile_startup: bool = False):
         self.config = config
         self.logger = logger
+        self.profile_startup = profile_startup
         super().__init__(driver_class, css_path, watch_css, ansi_color)
 
     def compose(self):
         defaults = self.config.get('defaults', {})
 
+        # import in parallel the modules that will be needed by local widgets, modules used by remote widgets are
+        # imported one at a time while creating them
+        local_modules, remote_modules = _collect_modules(self.config['mods'], defaults)
+        ModuleRegistry.preload(local_modules - remote_modules)
+
         for w_id, conf in cast(dict[str, dict[str, Any]], self.config['mods']).items():
             if conf is None: conf = {}
 
@@ -73,19 +81,8 @@ class MainApp(App):
                                  conf['window'].get('x', 0))
 
             try:
-                #a VERY UGLY hack to allow importing libvirt module without loading its library if running through
-                # remote connection
-                # 0. just to be sure no one is messing with environment variabled, remove the variable that skips the import phase
-                os.environ.pop('__PYD_SKIP_OPTIONAL_IMPORTS__', None)
-                # 1. if running through remote connection allow skipping imports
-                if 'remote_host' in conf:
-                    os.environ['__PYD_SKIP_OPTIONAL_IMPORTS__'] = 'true'
-                # 2. do the import as always
-                m = import_module('pydashboard.modules.' + mod)
-                widget: Module = m.widget(logger=self.logger, id=w_id, defaults=defaults | conf.pop('defaults', {}),
-                                          mod_type=mod, **conf)
-                # 3. clear the variable
-                os.environ.pop('__PYD_SKIP_OPTIONAL_IMPORTS__', None)
+                widget: Module = ModuleRegistry.create(mod, remote='remote_host' in conf, logger=self.logger, id=w_id,
+                                                       defaults=defaults | conf.pop('defaults', {}), **conf)
                 self.logger.success('Loaded widget {} - {} ({}) [x={coords.x},y={coords.y},w={coords.w},h={coords.h}]',
                                     w_id, widget.id, mod, coords=coords)
             except ModuleNotFoundError as e:
@@ -111,19 +108,22 @@ class MainApp(App):
             if hasattr(widget, 'ready_hooks'):
                 self.ready_hooks.update(widget.ready_hooks)
 
+        if self.profile_startup:
+            self.logger.info('Startup profile:\n{}', ModuleRegistry.report())
+
     def on_ready(self):
         self.signal.clear()
+        self.scheduler = Scheduler(self.signal, self.config.get('workers'))
         for key, hook in self.ready_hooks.items():
-            t = Thread(target=self.logger.catch(hook), args=(self.signal,), name=key)
-            self.modules_threads.append(t)
-            t.start()
+            self.scheduler.add(key, self.logger.catch(hook))
         self.ready_hooks.clear()
+        self.scheduler.start()
 
     def on_exit_app(self):
         self.logger.info('Stopping module threads')
         self.signal.set()
-        while self.modules_threads:
-            self.modules_threads.pop().join()
+        if self.scheduler is not None:
+            self.scheduler.stop()
         self.logger.info('Terminating remote connections')
         SessionManager.close_all()
 
@@ -132,6 +132,30 @@ class MainApp(App):
         super()._handle_exception(error)
 
 
+def _collect_modules(mods: dict[str, dict[str, Any]], defaults: dict[str, Any]) -> tuple[set[str], set[str]]:
+    """Names of the modules used by local and remote widgets, including the ones nested in vstacks"""
+    local_modules, remote_modules = set(), set()
+
+    for w_id, conf in mods.items():
+        if conf is None: conf = {}
+
+        if not conf.get('enabled', defaults.get('enabled', True)): continue
+
+        mod = conf.get('type', w_id.split('%')[0])
+
+        if 'remote_host' in conf or 'remote_host' in defaults:
+            remote_modules.add(mod)
+        else:
+            local_modules.add(mod)
+
+        if isinstance(conf.get('mods'), dict):
+            nested = _collect_modules(conf['mods'], defaults | conf.get('defaults', {}))
+            local_modules |= nested[0]
+            remote_modules |= nested[1]
+
+    return local_modules, remote_modules
+
+
 def main():
     from loguru import logger
 
@@ -143,6 +167,8 @@ def main():
     parser.add_argument('config', type=Path, default=Path.home()/'.config/pydashboard/config.yml', nargs='?')
     parser.add_argument('--log', type=Path, required=False)
     parser.add_argument('--debug', action=BooleanOptionalAction)
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print import and construction time of each module')
     args = parser.parse_args()
 
     pattern = re.compile(r"((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))")
@@ -191,7 +217,8 @@ def main():
     logger.debug("sys.executable: {}", sys.executable)
     logger.debug("sys.argv: {}", sys.argv)
 
-    main_app = MainApp(config=_config, logger=logger, ansi_color=_config.get('ansi_color', False))
+    main_app = MainApp(config=_config, logger=logger, ansi_color=_config.get('ansi_color', False),
+                       profile_startup=args.profile_startup)
 
     @logger.catch()
     def reloader(cfg_file, app: MainApp):
@@ -222,6 +249,9 @@ def main():
     except Exception as e:
         logger.opt(exception=e).critical(str(e))
 
+    if args.profile_startup:
+        print(ModuleRegistry.report())
+
     logger.info('Exiting')
 
 
@@ -1,9 +1,14 @@
+import os
+from argparse import ArgumentParser
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from importlib import import_module
+from threading import Event, Lock
+from time import monotonic
 
 import rpyc
 from loguru import logger
-from rpyc import ThreadedServer
-rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+from rpyc import ThreadedServer, ThreadPoolServer
 
 
 # noinspection PyUnboundLocalVariable
@@ -15,20 +20,103 @@ if not __package__:
     package_source_path = os.path.dirname(os.path.dirname(__file__))
     sys.path.insert(0, package_source_path)
 
+from pydashboard.utils.scheduler import Scheduler
+from pydashboard.utils.transport import pack
+
+
+# widget parameters that don't change the result of a call, ignored when looking for identical widgets
+PRESENTATION_KEYS = {'id', 'refresh_interval', 'align_horizontal', 'align_vertical', 'color', 'border', 'title',
+                     'title_align', 'title_background', 'title_color', 'title_style', 'subtitle', 'subtitle_align',
+                     'subtitle_background', 'subtitle_color', 'subtitle_style'}
+
+
+class DedupeCache:
+    def __init__(self, window: float):
+        """
+        Shares the result of identical calls made within `window` seconds, concurrent identical calls wait for the
+        first one instead of running again. Errors are not cached.
+        """
+        self.window = window
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[tuple, Future] = {}
+        self._lock = Lock()
+
+    def get(self, key: tuple, func):
+        with self._lock:
+            now = monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and (not entry.done() or now - entry.completed <= self.window):
+                self.hits += 1
+                leader = False
+            else:
+                self.misses += 1
+                leader = True
+                entry = self._entries[key] = Future()
+                for k in [k for k, e in self._entries.items() if e.done() and now - e.completed > self.window]:
+                    del self._entries[k]
+
+        if leader:
+            try:
+                result = func()
+            except BaseException as e:
+                with self._lock:
+                    self._entries.pop(key, None)
+                entry.set_exception(e)
+                raise
+            entry.completed = monotonic()
+            entry.set_result(result)
+            return result
+
+        return entry.result()
+
 
 class PyDashboardServer(rpyc.Service):
     module = None
     widget = None
+    # size of the pools running the widgets, see `main`
+    workers = min(32, (os.cpu_count() or 1) + 4)
+    # runs the widgets refreshed together by `call_many`
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ModuleWorker')
+    # refreshes the widgets in push mode, shared by all connections, started and stopped by `main`
+    scheduler: Scheduler = None
+    scheduler_lock = Lock()
+    # shares results between identical widgets of different clients, disabled if None
+    dedupe: DedupeCache | None = None
+    connections = 0
+
+    def on_connect(self, conn):
+        PyDashboardServer.connections += 1
+        # widgets of a multiplexed connection, by id
+        self.widgets = {}
+        # push mode subscriptions, by widget id
+        self.subscriptions = {}
+
+    def on_disconnect(self, conn):
+        PyDashboardServer.connections -= 1
+        # scheduled refreshes stop as soon as they find their subscription is gone
+        self.subscriptions.clear()
+        for widget in (self.widget, *self.widgets.values()):
+            if widget is not None:
+                widget.stop()
+
+    @staticmethod
+    def create_widget(module, setter_function, kwargs):
+        #just in case
+        kwargs.pop('logger', None)
+        widget = module.widget(logger=logger, **kwargs)
+        widget.set = setter_function
+        # widgets of different clients with the same module and parameters return the same data
+        widget.dedupe_key = (module.__name__,
+                             repr(sorted((k, v) for k, v in kwargs.items() if k not in PRESENTATION_KEYS)))
+        return widget
 
     def exposed_import_module(self, module_name, setter_function):
         self.module = import_module('pydashboard.modules.' + module_name)
         self.setter_function = setter_function
 
     def exposed_init_module(self, **kwargs):
-        #just in case
-        kwargs.pop('logger', None)
-        self.widget = self.module.widget(logger=logger, **kwargs)
-        self.widget.set = self.setter_function
+        self.widget = self.create_widget(self.module, self.setter_function, kwargs)
         return self.widget.id
 
     def exposed_post_init_module(self, *args, **kwargs):
@@ -37,11 +125,135 @@ class PyDashboardServer(rpyc.Service):
     def exposed_call_module(self, *args, **kwargs):
         return self.widget.__call__(*args, **kwargs)
 
+    def exposed_call_module_packed(self, arrow, *args, **kwargs):
+        """Same as `call_module`, but the result is serialized in a single message, see `pydashboard.utils.transport`"""
+        return self.call_packed(self.widget, arrow, *args, **kwargs)
+
+    def exposed_init_widget(self, module_name, setter_function, **kwargs):
+        """Create a widget on a multiplexed connection, it will be referenced by its id in the other calls"""
+        widget = self.create_widget(import_module('pydashboard.modules.' + module_name), setter_function, kwargs)
+        self.widgets[widget.id] = widget
+        return widget.id
+
+    def exposed_post_init_widget(self, widget_id, *args, **kwargs):
+        return self.widgets[widget_id].__post_init__(*args, **kwargs)
+
+    def exposed_call_many(self, arrow, calls):
+        """
+        Refresh many widgets of a multiplexed connection concurrently.
+
+        Args:
+            arrow: Whether the client can decode Arrow IPC
+            calls: `(widget_id, kwargs)` pairs, `kwargs` being a tuple of `(name, value)` pairs
+
+        Returns:
+            A `(success, result)` pair for each call, in the same order, `result` is the packed result of the widget or
+            the error message.
+        """
+        futures = [self.executor.submit(self.call_packed, self.widgets[widget_id], arrow, **dict(kwargs))
+                   for widget_id, kwargs in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append((True, future.result()))
+            except Exception as e:
+                logger.exception(str(e))
+                results.append((False, f'{type(e).__name__}: {e}'))
+        return tuple(results)
+
+    def exposed_subscribe(self, widget_id, push, arrow, **kwargs):
+        """
+        Refresh the widget on the server at its own refresh interval and call `push` with the packed result each time
+        it changes. A new subscription for the same widget replaces the previous one.
+
+        Args:
+            widget_id: Widget id on multiplexed connections, `None` for the widget of this connection
+            push: Function receiving the packed results
+            arrow: Whether the client can decode Arrow IPC
+            **kwargs: Arguments of each call to the widget
+        """
+        widget = self.widget if widget_id is None else self.widgets[widget_id]
+        subscription = {'push': rpyc.async_(push), 'arrow': arrow, 'kwargs': kwargs, 'last': None}
+        self.subscriptions[widget.id] = subscription
+
+        with self.scheduler_lock:
+            if PyDashboardServer.scheduler is None:
+                # service not started by `main`, e.g. embedded in another server
+                PyDashboardServer.scheduler = Scheduler(Event(), self.workers, daemon=True)
+                PyDashboardServer.scheduler.start()
+        self.scheduler.add(widget.id, partial(self._push, widget, subscription))
+
+    def _push(self, widget, subscription, _signal):
+        if self.subscriptions.get(widget.id) is not subscription:
+            # unsubscribed or client disconnected
+            return None
+
+        try:
+            payload = self.call_packed(widget, subscription['arrow'], **subscription['kwargs'])
+        except Exception as e:
+            logger.exception(str(e))
+            return widget.refresh_interval or None
+
+        if not isinstance(payload, bytes) or payload != subscription['last']:
+            try:
+                subscription['push'](payload)
+            except EOFError:
+                return None
+            subscription['last'] = payload
+
+        return widget.refresh_interval or None
+
+    def call_packed(self, widget, arrow, *args, **kwargs):
+        def call():
+            return pack(widget.__call__(*args, **kwargs), getattr(widget, 'transport_columns', None), arrow)
+
+        if self.dedupe is None:
+            return call()
+        return self.dedupe.get((widget.dedupe_key, arrow, args, tuple(sorted(kwargs.items()))), call)
+
+    def exposed_stats(self):
+        """Server statistics: open connections, pool size, deduplicated and executed calls"""
+        return (self.connections, self.workers,
+                self.dedupe.hits if self.dedupe else 0, self.dedupe.misses if self.dedupe else 0)
+
 
 def main():
-    server = ThreadedServer(PyDashboardServer, port=60001, protocol_config=rpyc.core.protocol.DEFAULT_CONFIG)
-    logger.info('Starting PyDashboardServer on port 60001')
-    server.start()
+    parser = ArgumentParser(prog='pydashboard-server')
+    parser.add_argument('--host', default=None,
+                        help='Address to listen on, defaults to all interfaces. Clients connect through an SSH tunnel, '
+                             'so 127.0.0.1 is enough')
+    parser.add_argument('--port', type=int, default=60001)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Serve all the connections with a fixed number of threads, 0 uses a thread per connection')
+    parser.add_argument('--dedupe-window', type=float, default=0,
+                        help='Seconds an identical widget call from another client reuses the last result, 0 (default) '
+                             'disables. Keep it shorter than the refresh_interval of the widgets')
+    parser.add_argument('--allow-pickle', action='store_true',
+                        help='Let clients copy the results with pickle, only needed by clients older than the packed '
+                             'results transport. Pickle lets a client execute arbitrary code on the server')
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        PyDashboardServer.workers = args.workers
+        PyDashboardServer.executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='ModuleWorker')
+    if args.dedupe_window > 0:
+        PyDashboardServer.dedupe = DedupeCache(args.dedupe_window)
+
+    protocol_config = {'allow_pickle': args.allow_pickle}
+    if args.workers > 0:
+        server = ThreadPoolServer(PyDashboardServer, hostname=args.host, port=args.port, nbThreads=args.workers,
+                                  protocol_config=protocol_config)
+    else:
+        server = ThreadedServer(PyDashboardServer, hostname=args.host, port=args.port,
+                                protocol_config=protocol_config)
+    logger.info('Starting PyDashboardServer on {}:{} ({}, dedupe window {}s)', args.host or '*', args.port,
+                f'{args.workers} workers' if args.workers > 0 else 'thread per connection', args.dedupe_window)
+    PyDashboardServer.scheduler = Scheduler(Event(), PyDashboardServer.workers)
+    PyDashboardServer.scheduler.start()
+    try:
+        server.start()
+    finally:
+        PyDashboardServer.scheduler.stop()
 
 
 if __name__ == '__main__':
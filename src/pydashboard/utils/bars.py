@@ -1,5 +1,15 @@
 from math import ceil, floor
-from typing import Literal
+from typing import Hashable, Literal, Sequence
+
+import numpy as np
+
+from pydashboard.utils.ringbuffer import RingBuffer
+
+_BLOCKS = np.array(list(' ▁▂▃▄▅▆▇█'))
+# braille dots lit from the bottom of the left and right columns, indexed by the number of dots
+_BRAILLE_LEFT = (0, 0x40, 0x44, 0x46, 0x47)
+_BRAILLE_RIGHT = (0, 0x80, 0xA0, 0xB0, 0xB8)
+_BRAILLE = np.array([chr(0x2800 + left + right) for left in _BRAILLE_LEFT for right in _BRAILLE_RIGHT])
 
 
 def calc_bars_sizes(content_width: int, bars: Literal['auto', 0, 1, 2]):
@@ -20,7 +30,7 @@ def calc_bars_sizes(content_width: int, bars: Literal['auto', 0, 1, 2]):
     return bars, lbar, rbar
 
 
-def create_bar(max_w: int, perc: int | float, text: str = '', pre_txt='', color='red'):
+def create_bar(max_w: int, perc: int | float, text: str = '', pre_txt='', color='red', spark=''):
     if perc is None:
         # percentage can be None in case of errors and pre_txt will display
         # the associated message
@@ -32,6 +42,14 @@ def create_bar(max_w: int, perc: int | float, text: str = '', pre_txt='', color=
         # preceding text takes precedence and can take all the available space
         return pre_txt
 
+    if spark:
+        # the history is shown between the preceding text and the bar, its oldest samples are dropped if the bar
+        # would be left without room
+        keep = max(max_w - 3, 0)
+        spark = spark[len(spark) - keep:] if len(spark) > keep else spark
+        max_w -= len(spark)
+        pre_txt += f"[{color}]{spark}[/{color}]" if spark else ''
+
     max_w -= 2  # square brackets at both ends
     text = text[:max_w]  # cut text if too long to prevent overflow
 
@@ -47,3 +65,78 @@ def create_bar(max_w: int, perc: int | float, text: str = '', pre_txt='', color=
     bar = f"[{color}]{bar[:color_width]}[/{color}]{bar[color_width:]}"
 
     return fr'{pre_txt}\[{bar}]'
+
+
+def sparklines(values: np.ndarray, width: int, lo: float = 0, hi: float = 100,
+               style: Literal['block', 'braille'] = 'block') -> list[str]:
+    """
+    Render the last samples of each row of `values` as a sparkline of `width` characters, all the rows are rendered
+    at once.
+
+    Args:
+        values: One row per series, samples in chronological order, NaN for missing samples
+        width: Width of the sparklines, each character shows one sample with style `block` and two with `braille`
+        lo: Value shown as an empty character
+        hi: Value shown as a full character
+        style: `block` for 8 levels using the block elements, `braille` for 4 levels with twice the samples
+    """
+    values = np.atleast_2d(values)
+    if width <= 0:
+        return [''] * len(values)
+
+    levels = 8 if style == 'block' else 4
+    samples = width * (1 if style == 'block' else 2)
+    values = values[:, -samples:]
+    if values.shape[1] < samples:
+        # not enough history yet, the sparkline grows from the right
+        values = np.concatenate((np.full((len(values), samples - values.shape[1]), np.nan), values), axis=1)
+
+    # any value above lo lights at least one level, missing samples are empty
+    scaled = np.ceil((values - lo) * (levels / (hi - lo)))
+    index = np.clip(np.nan_to_num(scaled, nan=0), 0, levels).astype(np.intp)
+
+    if style == 'block':
+        chars = _BLOCKS[index]
+    else:
+        chars = _BRAILLE[index[:, 0::2] * len(_BRAILLE_RIGHT) + index[:, 1::2]]
+    # join the characters of each row viewing them as a single string
+    return np.ascontiguousarray(chars).view(f'<U{width}')[:, 0].tolist()
+
+
+class BarHistory:
+    def __init__(self, width: int, style: Literal['block', 'braille'] = 'block'):
+        """
+        History of the values shown by the bars of a widget, rendered as sparklines.
+
+        Bars are identified by a key: bars appearing for the first time start with an empty history and the history of
+        bars no longer shown is dropped.
+
+        Args:
+            width: Width of the sparklines in characters, 0 disables the history
+            style: See `sparklines`
+        """
+        self.width = width
+        self.style = style
+        self.keys: tuple[Hashable, ...] = ()
+        self.buffer = RingBuffer(width * (1 if style == 'block' else 2), 0)
+
+    def __bool__(self):
+        return self.width > 0
+
+    def update(self, keys: Sequence[Hashable], values: Sequence[float | None]) -> list[str]:
+        """
+        Add a sample to the history of each bar and return their sparklines, in the same order.
+
+        Args:
+            keys: Key of each bar
+            values: Value of each bar, `None` if not available
+        """
+        if not self:
+            return [''] * len(keys)
+        keys = tuple(keys)
+        if keys != self.keys:
+            old = {k: i for i, k in enumerate(self.keys)}
+            self.buffer = self.buffer.take([old.get(k, -1) for k in keys])
+            self.keys = keys
+        self.buffer.append([np.nan if v is None else v for v in values])
+        return sparklines(self.buffer.values(), self.width, style=self.style)
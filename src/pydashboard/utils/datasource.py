@@ -0,0 +1,112 @@
+from concurrent.futures import Future
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+from loguru import logger
+
+
+class DataSource:
+    """
+    Backend shared by all the widgets using the same endpoint and credentials.
+
+    Widgets ask for data with `fetch`: results are cached for `ttl` seconds and concurrent requests for the same data
+    wait for the one already running instead of sending a new one, so two widgets showing different views of the same
+    backend (e.g. different columns, or VMs and storages of the same cluster) cost a single request.
+
+    Use `DataSource.get` to obtain the shared instance.
+    """
+    _sources: dict[tuple, 'DataSource'] = {}
+    _sources_lock = Lock()
+
+    def __init__(self, backend: str, endpoint: str, factory: Callable[[], Any]):
+        self.backend = backend
+        self.endpoint = endpoint
+        self.hits = 0
+        self.misses = 0
+        self.logger = logger.bind(module="DataSource")
+        self._factory = factory
+        self._client = None
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+        # longest ttl each query was requested with, results are kept until the slowest widget can reuse them
+        self._ttls: dict[Hashable, float] = {}
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = Lock()
+
+    @classmethod
+    def get(cls, backend: str, endpoint: str, credentials: Hashable, factory: Callable[[], Any]) -> 'DataSource':
+        """
+        Return the shared source for the given backend, endpoint and credentials, creating it if needed.
+
+        Args:
+            backend: Backend type, e.g. the module name
+            endpoint: Address of the backend
+            credentials: Anything identifying the credentials, sources with different credentials are never shared
+            factory: Creates the client of the backend, called once on the first `fetch`
+        """
+        key = (backend, endpoint, credentials)
+        with cls._sources_lock:
+            source = cls._sources.get(key)
+            if source is None:
+                source = cls._sources[key] = cls(backend, endpoint, factory)
+            return source
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+            return self._client
+
+    def fetch(self, query: Hashable, func: Callable[[Any], Any], ttl: float):
+        """
+        Return the result of `func(client)`, reusing the result of the same `query` if it is not older than `ttl`
+        seconds or waiting for it if it is already running. Errors are raised to all the waiting callers and are not
+        cached.
+
+        Cached results are shared: callers must not modify them.
+        """
+        with self._lock:
+            now = monotonic()
+            self._ttls[query] = max(self._ttls.get(query, 0), ttl)
+            cached = self._results.get(query)
+            if cached is not None and now - cached[0] < ttl:
+                self.hits += 1
+                return cached[1]
+            future = self._inflight.get(query)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[query] = Future()
+            else:
+                self.hits += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(self.client)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[query]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[query]
+            # results are timestamped with the start of the request, so a widget refreshing every `ttl` seconds
+            # never gets back its own previous result
+            self._results[query] = (now, result)
+            for q in [q for q, (t, _) in self._results.items() if now - t >= self._ttls[q]]:
+                del self._results[q]
+        future.set_result(result)
+        self.logger.trace('{} {} fetched {}', self.backend, self.endpoint, query)
+        return result
+
+    def invalidate(self, query: Hashable = None):
+        """Drop the cached result of `query`, or all the cached results"""
+        with self._lock:
+            if query is None:
+                self._results.clear()
+            else:
+                self._results.pop(query, None)
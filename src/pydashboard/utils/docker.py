@@ -0,0 +1,228 @@
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException
+from threading import Lock
+from typing import Any, Iterator
+from urllib.parse import urlencode
+
+from loguru import logger
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+
+# container state after each event, events not listed here don't change it
+_event_states = {
+    "create"  : "created",
+    "start"   : "running",
+    "restart" : "running",
+    "unpause" : "running",
+    "pause"   : "paused",
+    "die"     : "exited",
+    "stop"    : "exited",
+}
+
+
+class DockerError(RuntimeError):
+    """Error response of the Docker API"""
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = None):
+        """HTTP connection over a unix socket"""
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+        except BaseException:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DockerClient:
+    """
+    Minimal client for the Docker Engine API.
+
+    Connections to the socket are kept alive and reused between requests. Up to `max_connections` requests run
+    concurrently, so `request_many` takes about as long as the slowest of the requests.
+
+    Use `DockerClient.get` to share the client between all the widgets using the same socket.
+    """
+    _clients: dict[str, 'DockerClient'] = {}
+    _clients_lock = Lock()
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = 30, max_connections: int = 4):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.logger = logger.bind(module="DockerClient")
+        self._idle: list[UnixHTTPConnection] = []
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='DockerClient')
+
+    @classmethod
+    def get(cls, socket_path: str = DEFAULT_SOCKET, timeout: float = 30) -> 'DockerClient':
+        """Return the shared client for the given socket, creating it if needed"""
+        with cls._clients_lock:
+            client = cls._clients.get(socket_path)
+            if client is None:
+                client = cls._clients[socket_path] = cls(socket_path, timeout)
+            client.timeout = timeout
+            return client
+
+    @classmethod
+    def close_all(cls):
+        with cls._clients_lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+
+    def _acquire(self) -> tuple[UnixHTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return UnixHTTPConnection(self.socket_path, self.timeout), False
+
+    def _release(self, conn: UnixHTTPConnection):
+        with self._lock:
+            self._idle.append(conn)
+
+    def request(self, path: str) -> Any:
+        """GET `path` and return the decoded JSON response"""
+        conn, reused = self._acquire()
+        try:
+            status, body = self._get(conn, path)
+        except (OSError, HTTPException) as e:
+            conn.close()
+            if not reused:
+                raise
+            # the daemon closed an idle connection, try again once on a new one
+            self.logger.debug('Connection to {} lost ({}), reconnecting', self.socket_path, e)
+            conn = UnixHTTPConnection(self.socket_path, self.timeout)
+            try:
+                status, body = self._get(conn, path)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn)
+
+        if status >= 400:
+            raise _error(status, body)
+        return json.loads(body)
+
+    def _get(self, conn: UnixHTTPConnection, path: str) -> tuple[int, bytes]:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+
+    def request_many(self, *paths: str) -> list[Any]:
+        """Request all `paths` concurrently, results are returned in the same order"""
+        futures = [self._executor.submit(self.request, path) for path in paths]
+        return [future.result() for future in futures]
+
+    def submit(self, path: str):
+        """Request `path` in background, returns a `Future`"""
+        return self._executor.submit(self.request, path)
+
+    def events(self, since: float = None, filters: dict[str, list[str]] = None,
+               connection: UnixHTTPConnection = None) -> Iterator[dict]:
+        """
+        Follow the events stream on a dedicated connection, yields the events as they happen until the connection is
+        closed by the daemon.
+
+        Args:
+            since: Also return the events that happened after this timestamp
+            filters: Event filters, e.g. `{'type': ['container']}`, see `GET /events` in the Docker Engine API
+            connection: Connection to use instead of a new one, so that the caller can shut down its socket from
+                another thread to stop waiting for events
+        """
+        params = {}
+        if since is not None:
+            params['since'] = f'{since:.9f}'
+        if filters:
+            params['filters'] = json.dumps(filters)
+        # no timeout, the stream is silent as long as nothing happens
+        conn = connection or UnixHTTPConnection(self.socket_path)
+        try:
+            conn.request('GET', '/events?' + urlencode(params) if params else '/events')
+            response = conn.getresponse()
+            if response.status >= 400:
+                raise _error(response.status, response.read())
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+
+class ContainerIndex:
+    """
+    Name and state of the containers, loaded once from the container list and then kept up to date applying the
+    container events. `version` is incremented each time something changes.
+    """
+
+    def __init__(self):
+        self.containers: dict[str, dict[str, str]] = {}
+        self.version = 0
+        self._lock = Lock()
+
+    def load(self, containers: list[dict]):
+        """Replace the index with the response of `/containers/json?all=true`"""
+        with self._lock:
+            self.containers = {c['Id']: {'Names': c['Names'][0].split('/')[-1], 'State': c['State']}
+                               for c in containers}
+            self.version += 1
+
+    def apply(self, event: dict) -> bool:
+        """Update the index with a container event, returns whether the index changed"""
+        if event.get('Type') != 'container':
+            return False
+        actor = event.get('Actor', {})
+        container_id = actor.get('ID') or event.get('id')
+        # actions like exec_start carry the command after a colon
+        action = (event.get('Action') or event.get('status') or '').split(':')[0]
+        name = actor.get('Attributes', {}).get('name')
+
+        with self._lock:
+            current = self.containers.get(container_id)
+            if action == 'destroy':
+                changed = self.containers.pop(container_id, None) is not None
+            elif action == 'rename' and current is not None:
+                changed = name is not None and current['Names'] != name
+                if changed:
+                    current['Names'] = name
+            elif action in _event_states:
+                new = {'Names': name or (current or {}).get('Names', container_id[:12]),
+                       'State': _event_states[action]}
+                changed = current != new
+                self.containers[container_id] = new
+            else:
+                changed = False
+            if changed:
+                self.version += 1
+        return changed
+
+    def snapshot(self) -> tuple[int, list[dict[str, str]]]:
+        """Current version and a copy of the containers"""
+        with self._lock:
+            return self.version, [dict(c) for c in self.containers.values()]
+
+
+def _error(status: int, body: bytes) -> DockerError:
+    try:
+        message = json.loads(body)['message']
+    except (ValueError, KeyError, TypeError):
+        message = body.decode(errors='replace')
+    return DockerError(f'{status} {message}')
@@ -0,0 +1,227 @@
+"""
+NVIDIA GPU sampling.
+
+Samplers run in background and keep the last sample in `latest`, so widgets can read it without waiting. Two backends
+are available: NVML, loaded with ctypes from the driver library, and a single long-lived `nvidia-smi --loop-ms`
+process whose CSV output is parsed as it's printed. Use `GPUSampler.get` to get the shared sampler of the best backend
+available.
+"""
+import ctypes
+import shutil
+from abc import ABC, abstractmethod
+from subprocess import PIPE, Popen, STDOUT
+from threading import Event, Lock, Thread
+from typing import Callable, Iterable, NamedTuple
+
+from loguru import logger
+
+from pydashboard.utils.numbers import safe_float_cast
+
+QUERY = ('index', 'utilization.gpu', 'memory.total', 'memory.used', 'temperature.gpu')
+_UNAVAILABLE = object()
+"""`GPUSampler._shared` when no backend is available, so they are not probed again"""
+
+
+class GPUStats(NamedTuple):
+    index: int
+    utilization: float
+    """Percent"""
+    memory_total: float
+    """MiB"""
+    memory_used: float
+    """MiB"""
+    temperature: float
+    """°C"""
+
+
+class GPUError(RuntimeError):
+    """The GPU driver can't be queried"""
+
+
+def parse_csv_line(line: str, n: int = 0) -> GPUStats:
+    """
+    Parse a line of `nvidia-smi --query-gpu=<QUERY> --format=csv,noheader,nounits`.
+
+    Args:
+        line: Line to parse
+        n: Index to use if the one in the line is not valid
+    """
+    vals = [v.strip() for v in line.split(',')]
+    if len(vals) != len(QUERY):
+        raise ValueError(f'Unexpected nvidia-smi output: {line!r}')
+    try:
+        gpu_id = int(vals[0])
+    except ValueError:
+        gpu_id = n
+    return GPUStats(gpu_id, *(safe_float_cast(v) for v in vals[1:]))
+
+
+class GPUSampler(ABC):
+    _shared: 'GPUSampler | object | None' = None
+    _shared_lock = Lock()
+
+    def __init__(self, interval: float = 1):
+        """
+        Base class of the samplers, `run` is executed in a background thread once `start` is called.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.latest: tuple[GPUStats, ...] = ()
+        """Last sample of all the GPUs"""
+        self.error: str | None = None
+        """Last error, cleared by the next successful sample"""
+        self.logger = logger.bind(module=type(self).__name__)
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @classmethod
+    def get(cls, interval: float = 1) -> 'GPUSampler | None':
+        """
+        Return the started sampler shared by all the widgets, creating it on the first call with the best backend
+        available: NVML, then `nvidia-smi`. Returns `None` if neither is available, without probing them again.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                try:
+                    cls._shared = NVMLSampler(interval)
+                except (OSError, GPUError) as e:
+                    logger.debug('NVML not available ({}), trying nvidia-smi', e)
+                    if shutil.which('nvidia-smi') is None:
+                        cls._shared = _UNAVAILABLE
+                        return None
+                    cls._shared = NvidiaSmiSampler(interval)
+                cls._shared.start()
+            return None if cls._shared is _UNAVAILABLE else cls._shared
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self.run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @abstractmethod
+    def run(self):
+        """Sample until `stop` is called, updating `latest` and `error`"""
+
+
+class _Utilization(ctypes.Structure):
+    _fields_ = [('gpu', ctypes.c_uint), ('memory', ctypes.c_uint)]
+
+
+class _Memory(ctypes.Structure):
+    _fields_ = [('total', ctypes.c_ulonglong), ('free', ctypes.c_ulonglong), ('used', ctypes.c_ulonglong)]
+
+
+_NVML_TEMPERATURE_GPU = 0
+
+
+class NVMLSampler(GPUSampler):
+    def __init__(self, interval: float = 1, library: str = 'libnvidia-ml.so.1'):
+        """
+        Samples the GPUs through the NVIDIA Management Library, the same used by `nvidia-smi`, without starting any
+        process. Raises `OSError` if the library is not installed and `GPUError` if it can't be initialized.
+        """
+        super().__init__(interval)
+        self._nvml = ctypes.CDLL(library)
+        self._nvml.nvmlErrorString.restype = ctypes.c_char_p
+        self._check(self._nvml.nvmlInit_v2())
+        count = ctypes.c_uint()
+        self._check(self._nvml.nvmlDeviceGetCount_v2(ctypes.byref(count)))
+        self._handles = []
+        for i in range(count.value):
+            handle = ctypes.c_void_p()
+            self._check(self._nvml.nvmlDeviceGetHandleByIndex_v2(i, ctypes.byref(handle)))
+            self._handles.append(handle)
+
+    def _check(self, ret: int):
+        if ret != 0:
+            raise GPUError(f'NVML: {self._nvml.nvmlErrorString(ret).decode()}')
+
+    def sample(self) -> tuple[GPUStats, ...]:
+        util, mem, temp = _Utilization(), _Memory(), ctypes.c_uint()
+        stats = []
+        for i, handle in enumerate(self._handles):
+            self._check(self._nvml.nvmlDeviceGetUtilizationRates(handle, ctypes.byref(util)))
+            self._check(self._nvml.nvmlDeviceGetMemoryInfo(handle, ctypes.byref(mem)))
+            self._check(self._nvml.nvmlDeviceGetTemperature(handle, _NVML_TEMPERATURE_GPU, ctypes.byref(temp)))
+            stats.append(GPUStats(i, float(util.gpu), mem.total / 2 ** 20, mem.used / 2 ** 20, float(temp.value)))
+        return tuple(stats)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.latest = self.sample()
+                self.error = None
+            except GPUError as e:
+                self.error = str(e)
+            self._stop.wait(self.interval)
+
+
+class NvidiaSmiSampler(GPUSampler):
+    def __init__(self, interval: float = 1, popen: Callable[..., Popen] = Popen, restart_delay: float = 10):
+        """
+        Samples the GPUs with a single `nvidia-smi` process printing a new sample every `interval` seconds. If the
+        process exits it's started again after `restart_delay` seconds.
+
+        Args:
+            interval: Seconds between samples
+            popen: Starts the process, replace to use a fake `nvidia-smi`
+            restart_delay: Seconds to wait before starting the process again
+        """
+        super().__init__(interval)
+        self.popen = popen
+        self.restart_delay = restart_delay
+        self.args = ['nvidia-smi', f"--query-gpu={','.join(QUERY)}", '--format=csv,noheader,nounits',
+                     f'--loop-ms={max(int(interval * 1000), 1)}']
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                proc = self.popen(self.args, stdout=PIPE, stderr=STDOUT, text=True, bufsize=1)
+            except OSError as e:
+                self.error = str(e)
+            else:
+                try:
+                    self.consume(proc.stdout)
+                finally:
+                    proc.kill()
+                    proc.wait()
+                if not self._stop.is_set():
+                    self.logger.warning('nvidia-smi exited with code {}', proc.returncode)
+            self._stop.wait(self.restart_delay)
+
+    def consume(self, lines: Iterable[str]):
+        """
+        Parse the output of `nvidia-smi`, publishing a sample each time all the GPUs have been printed.
+
+        Each iteration of the loop prints a line per GPU, a sample is complete when a GPU index appears again or when
+        the output stops (the last sample of a process that exited).
+        """
+        frame: list[GPUStats] = []
+        for line in lines:
+            if self._stop.is_set():
+                return
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                stats = parse_csv_line(line, len(frame))
+            except ValueError:
+                # e.g. "Failed to initialize NVML: Driver/library version mismatch"
+                self.error = line
+                self.logger.error(line)
+                continue
+            if any(s.index == stats.index for s in frame):
+                self.latest, frame = tuple(frame), []
+                self.error = None
+            frame.append(stats)
+            if len(frame) == len(self.latest):
+                # same number of GPUs as the last sample, no need to wait for the next one to publish it
+                self.latest, frame = tuple(frame), []
+                self.error = None
+        if frame:
+            self.latest = tuple(frame)
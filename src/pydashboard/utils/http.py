@@ -0,0 +1,141 @@
+from threading import Lock
+from time import perf_counter
+from typing import Callable
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError, Timeout
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_TIMEOUT = 30
+
+MetricsHook = Callable[[str, str, int | None, float], None]
+"""Called after each request with method, url, status code (None if the request failed) and latency in seconds"""
+
+_metrics_hooks: list[MetricsHook] = []
+_sessions: dict[tuple[str, str, bool], 'Session'] = {}
+_sessions_lock = Lock()
+_logger = logger.bind(module="HTTP")
+
+
+def add_metrics_hook(hook: MetricsHook):
+    _metrics_hooks.append(hook)
+
+
+def remove_metrics_hook(hook: MetricsHook):
+    _metrics_hooks.remove(hook)
+
+
+class HTTP2Adapter(BaseAdapter):
+    """Transport adapter sending requests through an httpx client with HTTP/2 enabled"""
+
+    def __init__(self):
+        super().__init__()
+        self._clients: dict[bool | str, 'httpx.Client'] = {}
+        self._lock = Lock()
+
+    def _client(self, verify) -> 'httpx.Client':
+        # httpx sets certificate verification per client and not per request
+        with self._lock:
+            if verify not in self._clients:
+                self._clients[verify] = httpx.Client(http2=True, verify=verify)
+            return self._clients[verify]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        try:
+            r = self._client(verify).request(request.method, request.url, headers=request.headers,
+                                             content=request.body, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = r.content
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+class Session(requests.Session):
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, http2: bool = False):
+        """
+        Requests session applying a default timeout to every request and reporting request latency to the metrics
+        hooks.
+
+        Args:
+            timeout: Default timeout in seconds, used when a request does not specify its own
+            http2: Use HTTP/2 where supported by the server, requires `httpx[http2]` to be installed
+        """
+        super().__init__()
+        self.timeout = timeout
+        if http2:
+            if httpx is None:
+                _logger.warning('HTTP/2 requested but httpx is not installed, falling back to HTTP/1.1')
+            else:
+                adapter = HTTP2Adapter()
+                self.mount('https://', adapter)
+                self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        status = None
+        start = perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = perf_counter() - start
+            _logger.trace('{} {} returned {} in {:.3f}s', method, url, status, elapsed)
+            for hook in _metrics_hooks:
+                try:
+                    hook(method, url, status, elapsed)
+                except Exception as e:
+                    _logger.exception(e)
+
+
+def get_session(url: str, *, http2: bool = False) -> Session:
+    """
+    Return the session shared by all the widgets connecting to the same host, so that connections are kept alive and
+    reused between refreshes.
+
+    Shared sessions must not be modified (headers, auth, cookies...): pass those as request arguments or create a
+    dedicated `Session`.
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc, http2)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = Session(http2=http2)
+        return _sessions[key]
+
+
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
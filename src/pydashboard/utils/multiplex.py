@@ -0,0 +1,63 @@
+from concurrent.futures import Future
+from threading import Lock
+from time import sleep
+from typing import Callable
+
+from loguru import logger
+
+from pydashboard.utils.transport import ARROW_AVAILABLE, unpack
+
+
+class RemoteWidgetError(RuntimeError):
+    """Error raised by a widget running on a remote server"""
+
+
+class CallBatcher:
+    def __init__(self, call_many: Callable, window: float = 0.02):
+        """
+        Groups the refreshes of the widgets sharing a multiplexed connection into a single `call_many` request.
+
+        The first widget asking for a refresh waits `window` seconds collecting the requests of the other widgets due
+        at the same time, then sends all of them together and hands each widget its own result.
+
+        Args:
+            call_many: `call_many` method of the remote service
+            window: How long to wait for other requests before sending the batch
+        """
+        self.call_many = call_many
+        self.window = window
+        self.logger = logger.bind(module="CallBatcher")
+        self._pending: list[tuple[str, tuple, Future]] = []
+        self._lock = Lock()
+
+    def call(self, widget_id: str, **kwargs):
+        future = Future()
+        with self._lock:
+            self._pending.append((widget_id, tuple(kwargs.items()), future))
+            leader = len(self._pending) == 1
+
+        if leader:
+            sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._send(batch)
+
+        return future.result()
+
+    def _send(self, batch: list[tuple[str, tuple, Future]]):
+        self.logger.trace('Refreshing {} widgets in a single request', len(batch))
+        try:
+            results = self.call_many(ARROW_AVAILABLE, tuple((widget_id, kwargs) for widget_id, kwargs, _ in batch))
+        except BaseException as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        for (*_, future), (ok, value) in zip(batch, results):
+            if not ok:
+                future.set_exception(RemoteWidgetError(value))
+                continue
+            try:
+                future.set_result(unpack(value))
+            except Exception as e:
+                future.set_exception(e)
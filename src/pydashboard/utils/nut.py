@@ -0,0 +1,199 @@
+import socket
+from threading import Lock
+
+from loguru import logger
+
+
+class NUTError(RuntimeError):
+    """Error returned by the NUT server (`ERR ...` responses)"""
+
+
+class NUTClient:
+    """
+    Minimal client for the Network UPS Tools protocol.
+
+    The connection is opened and authenticated on the first request and then kept open, if the server drops it the
+    client reconnects and retries the request once. Requests are pipelined: all the commands are sent at once and the
+    responses are read back in order, so querying many UPSes takes a single round trip.
+
+    Use `NUTClient.get` to share a single connection between all the widgets using the same server and credentials.
+    """
+    _clients: dict[tuple, 'NUTClient'] = {}
+    _clients_lock = Lock()
+
+    def __init__(self, host: str = "localhost", port: int = 3493, username: str = None, password: str = None,
+                 timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.logger = logger.bind(module="NUTClient")
+        self._sock: socket.socket | None = None
+        self._file = None
+        self._lock = Lock()
+
+    @classmethod
+    def get(cls, host: str = "localhost", port: int = 3493, username: str = None, password: str = None,
+            timeout: float = 30) -> 'NUTClient':
+        """Return the shared client for the given server and credentials, creating it if needed"""
+        key = (host, port, username, password)
+        with cls._clients_lock:
+            client = cls._clients.get(key)
+            if client is None:
+                client = cls._clients[key] = cls(host, port, username, password, timeout)
+            client.timeout = timeout
+            return client
+
+    @classmethod
+    def close_all(cls):
+        with cls._clients_lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile('rb')
+        self.logger.debug('Connected to {}:{}', self.host, self.port)
+        try:
+            commands = []
+            if self.username is not None:
+                commands.append(f"USERNAME {self.username}")
+            if self.password is not None:
+                commands.append(f"PASSWORD {quote(self.password)}")
+            for response in self._pipeline(commands):
+                if isinstance(response, NUTError):
+                    raise response
+        except BaseException:
+            self._disconnect()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._sock is None:
+                return
+            try:
+                self._sock.sendall(b"LOGOUT\n")
+            except OSError:
+                pass
+            self._disconnect()
+
+    def _disconnect(self):
+        for res in (self._file, self._sock):
+            try:
+                res.close()
+            except (OSError, AttributeError):
+                pass
+        self._file = self._sock = None
+
+    def request(self, *commands: str) -> list[str | list[str] | NUTError]:
+        """
+        Send `commands` in a single write and return their responses in the same order.
+
+        Single line responses are returned as strings, `LIST` responses as the list of lines between `BEGIN` and `END`,
+        `ERR` responses as `NUTError` instances (they are returned and not raised so the other responses are not lost).
+        """
+        with self._lock:
+            reused = self._sock is not None
+            if not reused:
+                self.connect()
+            try:
+                return self._pipeline(commands)
+            except (OSError, EOFError) as e:
+                self._disconnect()
+                if not reused:
+                    raise
+                # the server closed an idle connection, try again once on a new one
+                self.logger.debug('Connection to {}:{} lost ({}), reconnecting', self.host, self.port, e)
+                self.connect()
+                try:
+                    return self._pipeline(commands)
+                except BaseException:
+                    self._disconnect()
+                    raise
+
+    def _pipeline(self, commands) -> list[str | list[str] | NUTError]:
+        if not commands:
+            return []
+        self._sock.settimeout(self.timeout)
+        self._sock.sendall(''.join(f'{c}\n' for c in commands).encode())
+        return [self._read_response() for _ in commands]
+
+    def _readline(self) -> str:
+        line = self._file.readline()
+        if not line.endswith(b'\n'):
+            raise EOFError('Connection closed by server')
+        return line[:-1].decode(errors='replace')
+
+    def _read_response(self) -> str | list[str] | NUTError:
+        line = self._readline()
+        if line.startswith('ERR '):
+            return NUTError(line)
+        if not line.startswith('BEGIN LIST '):
+            return line
+        end = 'END' + line[5:]
+        lines = []
+        while (line := self._readline()) != end:
+            lines.append(line)
+        return lines
+
+    def list_ups(self) -> dict[str, str]:
+        """Names and descriptions of the UPSes known to the server"""
+        response, = self.request("LIST UPS")
+        return parse_list(response, 1)
+
+    def list_vars(self, *upsnames: str) -> dict[str, dict[str, str] | NUTError]:
+        """Variables of each UPS in `upsnames`, fetched in a single round trip"""
+        responses = self.request(*(f"LIST VAR {u}" for u in upsnames))
+        return {u: r if isinstance(r, NUTError) else parse_list(r, 2) for u, r in zip(upsnames, responses)}
+
+    def __del__(self):
+        self._disconnect()
+
+
+def quote(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def split_line(line: str) -> list[str]:
+    """Split a response line in words, handling double-quoted words with backslash escapes"""
+    words = []
+    i, n = 0, len(line)
+    while i < n:
+        if line[i] == ' ':
+            i += 1
+        elif line[i] == '"':
+            i += 1
+            word = []
+            while i < n and line[i] != '"':
+                if line[i] == '\\' and i + 1 < n:
+                    i += 1
+                word.append(line[i])
+                i += 1
+            words.append(''.join(word))
+            i += 1
+        else:
+            j = line.find(' ', i)
+            j = n if j < 0 else j
+            words.append(line[i:j])
+            i = j
+    return words
+
+
+def parse_list(response: str | list[str] | NUTError, key_index: int) -> dict[str, str]:
+    """Map the word at `key_index` to the last word of each line of a `LIST` response"""
+    if isinstance(response, NUTError):
+        raise response
+    if isinstance(response, str):
+        raise NUTError(response)
+    result = {}
+    for line in response:
+        words = split_line(line)
+        if len(words) > key_index:
+            result[words[key_index]] = words[-1]
+    return result
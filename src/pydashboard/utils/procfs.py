@@ -0,0 +1,189 @@
+"""
+CPU, memory and temperature sampling straight from `/proc` and `/sys`.
+
+Files are opened once and read again at each sample with `pread`, values are parsed into preallocated NumPy arrays.
+Linux only: `ProcSampler` raises `OSError` if `/proc/stat` is not available.
+"""
+import os
+from glob import glob
+
+import numpy as np
+
+from pydashboard.utils.ringbuffer import RingBuffer
+
+# /proc/stat cpu columns: user nice system idle iowait irq softirq steal guest guest_nice
+_IDLE = [3, 4]
+# guest time is already included in user and nice
+_TOTAL = slice(0, 8)
+# hwmon drivers reporting the CPU temperature, in order of preference, named like psutil.sensors_temperatures keys
+_CPU_HWMON = ('coretemp', 'k10temp', 'zenpower', 'cpu_thermal', 'soc_thermal', 'acpitz')
+# labels of the package temperature in order of preference, unlabeled inputs come last
+_PACKAGE_LABELS = ('Package', 'Tdie', 'Tctl')
+
+
+class _File:
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = 4096
+
+    def read(self) -> bytes:
+        while True:
+            data = os.pread(self.fd, self.size, 0)
+            if len(data) < self.size:
+                return data
+            # the file may be longer than the buffer, try again with a larger one
+            self.size *= 2
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read().strip()
+
+
+class ProcSampler:
+    def __init__(self, history: int = 60):
+        """
+        Samples CPU usage, frequency and temperature, memory and swap usage.
+
+        Args:
+            history: Number of samples of per core usage to keep
+        """
+        self._history_length = history
+        self._open()
+
+    def _open(self):
+        """Open the files read at each sample and allocate the arrays for the cpus currently online"""
+        self._stat = _File('/proc/stat')
+        self._meminfo = _File('/proc/meminfo')
+        self._freqs = [_File(p) for p in sorted(glob('/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq'),
+                                                key=lambda p: int(p.split('/')[5][3:]))]
+        self._freq = np.zeros(len(self._freqs))
+        self._package_temps, self._core_temps = self._open_temperatures()
+        self.memory: dict[str, int] = {}
+        self._reset(len(self._read_stat()) - 1)
+
+    def _reset(self, ncpu: int):
+        self._ticks = np.zeros((ncpu + 1, 10), dtype=np.int64)
+        self._last = np.zeros_like(self._ticks)
+        self.percent = np.zeros(ncpu + 1)
+        """Usage of all the cpus (first element) and of each core, updated by `sample`"""
+        self.history = RingBuffer(self._history_length, ncpu)
+        """Per core usage"""
+
+    @staticmethod
+    def _open_temperatures() -> tuple[list[_File], dict[int, _File]]:
+        """
+        Package and per core temperature inputs. Every hwmon device is checked, the package temperature is taken from
+        the preferred CPU driver found (see `_CPU_HWMON`), per core temperatures are only reported by `coretemp`.
+        """
+        packages: dict[str, list[tuple[int, str]]] = {}
+        cores = {}
+        for hwmon in glob('/sys/class/hwmon/hwmon*'):
+            try:
+                name = _read_text(f'{hwmon}/name')
+                if name not in _CPU_HWMON:
+                    continue
+                for input_path in glob(f'{hwmon}/temp*_input'):
+                    try:
+                        label = _read_text(input_path.removesuffix('_input') + '_label')
+                    except OSError:
+                        # e.g. cpu_thermal and acpitz have a single unlabeled input
+                        label = ''
+                    if name == 'coretemp' and label.startswith('Core '):
+                        cores[int(label.removeprefix('Core '))] = _File(input_path)
+                    elif label == '' or label.startswith(_PACKAGE_LABELS):
+                        rank = next((i for i, l in enumerate(_PACKAGE_LABELS) if label.startswith(l)),
+                                    len(_PACKAGE_LABELS))
+                        packages.setdefault(name, []).append((rank, input_path))
+            except (OSError, ValueError):
+                continue
+
+        name = next((n for n in _CPU_HWMON if n in packages), None)
+        if name is None:
+            return [], cores
+        # e.g. k10temp reports both Tdie and Tctl, which can have an offset, keep only the former
+        best = min(rank for rank, _ in packages[name])
+        return [_File(path) for rank, path in sorted(packages[name]) if rank == best], cores
+
+    def _read_stat(self) -> list[bytes]:
+        return [line for line in self._stat.read().split(b'\n') if line.startswith(b'cpu')]
+
+    def sample(self):
+        """Read CPU and memory usage, CPU usage is computed since the previous sample"""
+        lines = self._read_stat()
+        if len(lines) != len(self._ticks):
+            # cpus went online or offline, start over
+            self.close()
+            self._open()
+            lines = self._read_stat()
+
+        self._last, self._ticks = self._ticks, self._last
+        # pad rows of older kernels with fewer columns
+        for i, line in enumerate(lines):
+            values = line.split()[1:11]
+            self._ticks[i, :len(values)] = values
+        delta = self._ticks - self._last
+        total = delta[:, _TOTAL].sum(axis=1)
+        busy = total - delta[:, _IDLE].sum(axis=1)
+        np.divide(busy * 100, total, out=self.percent, where=total > 0)
+        np.clip(self.percent, 0, 100, out=self.percent)
+
+        self.history.append(self.percent[1:])
+
+        self.memory = {}
+        for line in self._meminfo.read().split(b'\n'):
+            key, _, value = line.partition(b':')
+            if value:
+                self.memory[key.decode()] = int(value.split()[0]) * 1024
+
+    def core_history(self) -> np.ndarray:
+        """Per core usage history in chronological order, one row per sample, NaN before the buffer is full"""
+        return self.history.values().T
+
+    def cpu_percent(self, percpu: bool = False) -> float | np.ndarray:
+        return self.percent[1:] if percpu else float(self.percent[0])
+
+    def cpu_freq(self, percpu: bool = False) -> float | np.ndarray | None:
+        """Current frequency in MHz, `None` if not available"""
+        if not self._freqs:
+            return None
+        for i, f in enumerate(self._freqs):
+            self._freq[i] = int(f.read())
+        self._freq /= 1000
+        return self._freq if percpu else float(self._freq.mean())
+
+    def package_temperature(self) -> float | None:
+        """Hottest CPU package temperature in °C, `None` if not available"""
+        if not self._package_temps:
+            return None
+        return max(int(f.read()) for f in self._package_temps) / 1000
+
+    def core_temperatures(self) -> dict[int, float]:
+        """Temperature of each core in °C"""
+        return {core: int(f.read()) / 1000 for core, f in self._core_temps.items()}
+
+    def virtual_memory(self) -> tuple[float, int, int]:
+        """Percent, used and total memory, computed like `psutil.virtual_memory`"""
+        total = self.memory['MemTotal']
+        used = total - self.memory.get('MemAvailable', self.memory['MemFree'])
+        return used / total * 100 if total else 0.0, used, total
+
+    def swap_memory(self) -> tuple[float, int, int]:
+        """Percent, used and total swap"""
+        total = self.memory.get('SwapTotal', 0)
+        used = total - self.memory.get('SwapFree', 0)
+        return used / total * 100 if total else 0.0, used, total
+
+    def close(self):
+        for f in [self._stat, self._meminfo, *self._freqs, *self._package_temps, *self._core_temps.values()]:
+            f.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, AttributeError):
+            pass
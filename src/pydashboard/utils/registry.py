@@ -0,0 +1,111 @@
+import os
+import pkgutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from threading import Lock
+from time import perf_counter
+from types import ModuleType
+from typing import Iterable
+
+from loguru import logger
+
+
+class ModuleRegistry:
+    """
+    Lazy index of the modules that can be loaded as widgets.
+
+    Available modules are discovered from the package directory without importing them, a module (and with it all its
+    dependencies) is imported only when the first widget using it is created. Import and construction times are
+    recorded to profile startup.
+    """
+    package = 'pydashboard.modules'
+    import_times: dict[str, float] = {}
+    construction_times: dict[str, tuple[str, float]] = {}
+    lock = Lock()
+    logger = logger.bind(module="ModuleRegistry")
+
+    @classmethod
+    def available(cls) -> list[str]:
+        """Names of the bundled modules, listed without importing them"""
+        package = import_module(cls.package)
+        return sorted(m.name for m in pkgutil.iter_modules(package.__path__) if not m.name.startswith('_'))
+
+    @classmethod
+    def get(cls, name: str) -> ModuleType:
+        """Import module `name` if not imported yet"""
+        full_name = f'{cls.package}.{name}'
+        module = sys.modules.get(full_name)
+        if module is not None:
+            return module
+
+        start = perf_counter()
+        module = import_module(full_name)
+        elapsed = perf_counter() - start
+        with cls.lock:
+            cls.import_times.setdefault(name, elapsed)
+        cls.logger.debug('Imported {} in {:.3f}s', name, elapsed)
+        return module
+
+    @classmethod
+    def preload(cls, names: Iterable[str], workers: int = 8):
+        """
+        Import modules in parallel. Errors are only logged: they will be raised again when the first widget using the
+        module is created.
+        """
+        names = [n for n in set(names) & set(cls.available()) if f'{cls.package}.{n}' not in sys.modules]
+        if not names:
+            return
+
+        def _preload(name):
+            try:
+                cls.get(name)
+            except Exception as e:
+                cls.logger.warning('Cannot preload {}: {}', name, e)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(names)), thread_name_prefix='ModuleLoader') as pool:
+            pool.map(_preload, names)
+
+    @classmethod
+    def create(cls, name: str, *, remote: bool = False, **kwargs):
+        """Create a new widget from module `name`, importing the module if needed"""
+        try:
+            # a VERY UGLY hack to allow importing libvirt module without loading its library if running through
+            # remote connection
+            # 0. just to be sure no one is messing with environment variables, remove the variable that skips the
+            #    import phase
+            os.environ.pop('__PYD_SKIP_OPTIONAL_IMPORTS__', None)
+            # 1. if running through remote connection allow skipping imports
+            if remote:
+                os.environ['__PYD_SKIP_OPTIONAL_IMPORTS__'] = 'true'
+            # 2. do the import as always
+            module = cls.get(name)
+
+            start = perf_counter()
+            widget = module.widget(mod_type=name, **kwargs)
+            elapsed = perf_counter() - start
+        finally:
+            # 3. clear the variable
+            os.environ.pop('__PYD_SKIP_OPTIONAL_IMPORTS__', None)
+
+        with cls.lock:
+            cls.construction_times[widget.id] = (name, elapsed)
+        return widget
+
+    @classmethod
+    def report(cls) -> str:
+        """Table of import and construction times of each module"""
+        rows = []
+        for name in sorted(cls.import_times.keys() | {m for m, _ in cls.construction_times.values()}):
+            widgets = [t for m, t in cls.construction_times.values() if m == name]
+            rows.append((name, cls.import_times.get(name, 0.0), len(widgets), sum(widgets)))
+
+        width = max([len(r[0]) for r in rows] + [len('Module')])
+        lines = [f"{'Module':<{width}}  {'Import':>9}  {'Widgets':>7}  {'Construction':>12}"]
+        lines += [f"{n:<{width}}  {i * 1000:>7.1f}ms  {w:>7}  {c * 1000:>10.1f}ms" for n, i, w, c in rows]
+        lines.append(f"{'Total':<{width}}  {sum(r[1] for r in rows) * 1000:>7.1f}ms  "
+                     f"{sum(r[2] for r in rows):>7}  {sum(r[3] for r in rows) * 1000:>10.1f}ms")
+        return '\n'.join(lines)
+
+    def __new__(cls):
+        raise TypeError('Static classes cannot be instantiated')
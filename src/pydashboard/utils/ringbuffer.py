@@ -0,0 +1,60 @@
+from typing import Sequence
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, length: int, series: int = 1):
+        """
+        Fixed size history of one or more series of samples, memory is allocated once and the oldest samples are
+        overwritten by the new ones. Missing samples are NaN.
+
+        Args:
+            length: Number of samples to keep
+            series: Number of series sampled together, e.g. one per CPU core
+        """
+        self.data = np.full((series, max(length, 1)), np.nan)
+        """One row per series, the last sample is at column `pos - 1`"""
+        self.pos = 0
+        self.count = 0
+        """Number of samples appended, up to `length`"""
+
+    @property
+    def length(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def series(self) -> int:
+        return self.data.shape[0]
+
+    def __len__(self):
+        return self.count
+
+    def append(self, values: float | Sequence[float] | np.ndarray):
+        """Add a sample of each series, replacing the oldest one if the buffer is full"""
+        self.data[:, self.pos] = values
+        self.pos = (self.pos + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def values(self) -> np.ndarray:
+        """Copy of the samples in chronological order, one row per series"""
+        return np.concatenate((self.data[:, self.pos:], self.data[:, :self.pos]), axis=1)
+
+    def last(self) -> np.ndarray:
+        """Last sample of each series"""
+        return self.data[:, self.pos - 1]
+
+    def take(self, rows: Sequence[int]) -> 'RingBuffer':
+        """
+        New buffer with the history of the given series, in the given order. Negative indexes add empty series.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        buffer = RingBuffer(self.length, len(rows))
+        keep = rows >= 0
+        buffer.data[keep] = self.data[rows[keep]]
+        buffer.pos, buffer.count = self.pos, self.count
+        return buffer
+
+    def clear(self):
+        self.data.fill(np.nan)
+        self.pos = self.count = 0
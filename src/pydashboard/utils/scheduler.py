@@ -0,0 +1,93 @@
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from math import ceil
+from threading import Condition, Event, Thread
+from time import monotonic
+from typing import Callable
+
+from loguru import logger
+
+Hook = Callable[[Event], float | int | None]
+
+
+class Scheduler:
+    """
+    Runs the refresh hooks of all the widgets from a single timer thread.
+
+    Each hook is called with the stop signal and returns its refresh interval in seconds (fractions are allowed), or a
+    falsy value to stop being called. Deadlines are kept on the monotonic clock, so hooks do not drift when their
+    update takes time or when the system clock changes. Due hooks are dispatched to a bounded pool of workers so the
+    number of threads does not depend on the number of widgets. A hook is never dispatched again while it is still
+    running.
+    """
+
+    def __init__(self, signal: Event, workers: int = None, daemon: bool = False):
+        self.signal = signal
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.logger = logger.bind(module="Scheduler")
+        self._queue: list[tuple[float, int, str, Hook]] = []
+        self._counter = count()
+        self._condition = Condition()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ModuleWorker')
+        # a daemon scheduler does not keep the process alive if nobody stops it
+        self._thread = Thread(target=self._run, name='Scheduler', daemon=daemon)
+
+    def add(self, key: str, hook: Hook, delay: float = 0):
+        with self._condition:
+            heapq.heappush(self._queue, (monotonic() + delay, next(self._counter), key, hook))
+            self._condition.notify()
+
+    def start(self):
+        self.logger.info('Starting scheduler with {} workers', self.workers)
+        self._thread.start()
+
+    def stop(self):
+        self.signal.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self.signal.is_set():
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    timeout = self._queue[0][0] - monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+
+                if self.signal.is_set():
+                    return
+
+                deadline, _, key, hook = heapq.heappop(self._queue)
+
+            self._pool.submit(self._dispatch, deadline, key, hook)
+
+    def _dispatch(self, deadline: float, key: str, hook: Hook):
+        interval = hook(self.signal)
+        if self.signal.is_set():
+            return
+        if not interval:
+            self.logger.debug('{} will not be scheduled anymore', key)
+            return
+
+        # the next deadline is computed from the previous one and not from the time the hook returned, so the time
+        # spent updating does not accumulate, if the hook took longer than its interval the missed runs are skipped
+        # keeping the original phase
+        deadline += interval
+        now = monotonic()
+        if deadline <= now:
+            deadline += ceil((now - deadline) / interval) * interval
+            if deadline <= now:
+                deadline += interval
+
+        with self._condition:
+            heapq.heappush(self._queue, (deadline, next(self._counter), key, hook))
+            self._condition.notify()
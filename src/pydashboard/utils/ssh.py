@@ -5,8 +5,9 @@ import rpyc
 from loguru import logger
 from plumbum import SshMachine
 from plumbum.machines.ssh_machine import SshTunnel
-from rpyc import Connection
-rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+from rpyc import BgServingThread, Connection
+
+from pydashboard.utils.multiplex import CallBatcher
 
 
 class SessionManager:
@@ -14,15 +15,17 @@ class SessionManager:
     active_tunnels: dict[str, SshTunnel] = {}
     active_sessions: dict[str, Connection] = {}
     active_sessions_count: dict[str, int] = defaultdict(lambda: 0)
+    active_batchers: dict[str, CallBatcher] = {}
+    active_bg_threads: dict[str, BgServingThread] = {}
     lock = Lock()
     logger = logger.bind(module="SSHSessionManager")
 
     @classmethod
     def create_connection(cls, host, user=None, port=None, keyfile=None, password=None,
-                          ssh_strict_host_key_checking=None, ssh_ignore_known_hosts_file=None):
+                          ssh_strict_host_key_checking=None, ssh_ignore_known_hosts_file=None, server_port=60001):
         with cls.lock:
             cls.logger.info('Connecting to {}', host)
-            conn_id = f'{user}@{host}:{port}'
+            conn_id = f'{user}@{host}:{port}/{server_port}'
             if conn_id not in cls.active_ssh:
                 ssh_opts = []
                 if ssh_strict_host_key_checking is not None:
@@ -40,7 +43,7 @@ class SessionManager:
                                                      password=password, ssh_opts=ssh_opts)
                 cls.logger.debug("Opened connection to {}", cls.active_ssh[conn_id])
             if conn_id not in cls.active_tunnels:
-                cls.active_tunnels[conn_id] = cls.active_ssh[conn_id].tunnel(0, 60001)
+                cls.active_tunnels[conn_id] = cls.active_ssh[conn_id].tunnel(0, server_port)
                 cls.logger.debug("Opened tunnel {}", cls.active_tunnels[conn_id])
 
         return conn_id
@@ -59,6 +62,38 @@ class SessionManager:
                        cls.active_tunnels[conn_id].lport)
         return cls.active_sessions[sess_id].root, sess_id
 
+    @classmethod
+    def create_multiplexed_session(cls, conn_id):
+        """
+        Open (or reuse) the single connection shared by all the multiplexed widgets of a host.
+
+        Returns:
+            The remote service, the session id and the batcher used to refresh the widgets together.
+        """
+        sess_id = f'{conn_id};*'
+        with cls.lock:
+            if sess_id not in cls.active_sessions:
+                cls.active_sessions[sess_id] = rpyc.connect('127.0.0.1', cls.active_tunnels[conn_id].lport,
+                                                            config=rpyc.core.protocol.DEFAULT_CONFIG)
+                cls.active_batchers[sess_id] = CallBatcher(cls.active_sessions[sess_id].root.call_many)
+                cls.logger.success('Opened multiplexed connection to {}:{} via SSH tunnel',
+                                   cls.active_ssh[conn_id].host, cls.active_tunnels[conn_id].lport)
+
+            cls.active_sessions_count[conn_id] += 1
+
+        return cls.active_sessions[sess_id].root, sess_id, cls.active_batchers[sess_id]
+
+    @classmethod
+    def serve_callbacks(cls, sess_id):
+        """Serve the requests sent by the server (push mode) in a background thread"""
+        with cls.lock:
+            if sess_id not in cls.active_bg_threads:
+                cls.active_bg_threads[sess_id] = BgServingThread(cls.active_sessions[sess_id])
+
+    @classmethod
+    def ping(cls, sess_id):
+        cls.active_sessions[sess_id].ping()
+
     @classmethod
     def close(cls, *, sess_id=None, conn_id=None):
         with cls.lock:
@@ -88,6 +123,9 @@ class SessionManager:
     @classmethod
     def __close_session(cls, sess_id):
         session = cls.active_sessions.pop(sess_id)
+        cls.active_batchers.pop(sess_id, None)
+        if (bg_thread := cls.active_bg_threads.pop(sess_id, None)) is not None:
+            bg_thread.stop()
         cls.logger.debug("Closing session {}", session)
         session.close()
 
@@ -0,0 +1,271 @@
+import re
+from codecs import getincrementaldecoder
+from collections import deque
+
+
+class LineBuffer:
+    def __init__(self, max_lines: int = 1000, max_line_length: int = 4096):
+        """
+        Keeps the last `max_lines` lines of a stream of terminal output.
+
+        Data can be fed in chunks of any size, even splitting multibyte characters. Line endings are normalized and
+        a carriage return not followed by a newline overwrites the current line (e.g. progress bars).
+
+        Args:
+            max_lines: Maximum number of complete lines to keep, older lines are discarded
+            max_line_length: Maximum number of characters kept of each line, including the incomplete one, longer
+                lines keep only their last characters (e.g. a program printing without ever ending the line)
+        """
+        self.lines: deque[str] = deque(maxlen=max_lines)
+        self.max_line_length = max_line_length
+        self._partial = ''
+        self._decoder = getincrementaldecoder('utf-8')(errors='replace')
+
+    def clear(self):
+        self.lines.clear()
+        self._partial = ''
+        self._decoder.reset()
+
+    def feed(self, data: bytes):
+        text = self._partial + self._decoder.decode(data)
+        *complete, self._partial = text.split('\n')
+        self.lines.extend(_overwrite(line)[-self.max_line_length:] for line in complete)
+        # only the text after the last carriage return will ever be shown, a trailing one may be part of a `\r\n`
+        cr = self._partial.rfind('\r', 0, -1)
+        if cr >= 0:
+            self._partial = self._partial[cr + 1:]
+        # +1 for a trailing carriage return
+        if len(self._partial) > self.max_line_length + 1:
+            self._partial = self._partial[-self.max_line_length - 1:]
+
+    def text(self) -> str:
+        """Lines received so far, including the last incomplete one"""
+        partial = _overwrite(self._partial)[-self.max_line_length:]
+        return '\n'.join([*self.lines, partial] if partial else self.lines)
+
+
+def _overwrite(line: str) -> str:
+    line = line.rstrip('\r')
+    return line[line.rfind('\r') + 1:]
+
+
+_sequences = re.compile(
+        r'\x1b\[([?>=!]?)([0-9;:]*)[ -/]*([@-~])'  # CSI, 1: private marker, 2: parameters, 3: command
+        r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'  # OSC, e.g. window title
+        r'|\x1b[()*+#%].'  # charset selection
+        r'|\x1b([^\[\]()*+#%])'  # other escapes, 4: command
+        r'|([\x00-\x1a\x1c-\x1f\x7f])',  # control characters, 5: character
+        re.DOTALL
+)
+
+
+class Screen:
+    def __init__(self, rows: int, cols: int):
+        """
+        Minimal terminal emulator, keeps only the visible `rows` x `cols` window of a stream of terminal output.
+
+        Supports cursor movement, erase and scroll sequences, which is enough for programs redrawing the screen (e.g.
+        `top`) or appending lines (e.g. `tail -f`). Colors and other attributes are discarded.
+        """
+        self.rows = max(rows, 1)
+        self.cols = max(cols, 1)
+        self.buffer = [self._blank() for _ in range(self.rows)]
+        self.row = self.col = 0
+        self._saved = (0, 0)
+        self._pending = ''
+        self._decoder = getincrementaldecoder('utf-8')(errors='replace')
+
+    def _blank(self) -> list[str]:
+        return [' '] * self.cols
+
+    def resize(self, rows: int, cols: int):
+        rows, cols = max(rows, 1), max(cols, 1)
+        if cols != self.cols:
+            self.buffer = [(line + [' '] * (cols - self.cols))[:cols] for line in self.buffer]
+            self.cols = cols
+        if rows < self.rows:
+            # drop lines from the top, but not the ones below the cursor
+            drop = min(max(self.row + 1 - rows, 0), self.rows - rows)
+            self.buffer = self.buffer[drop:drop + rows]
+            self.row -= drop
+        elif rows > self.rows:
+            self.buffer += [self._blank() for _ in range(rows - self.rows)]
+        self.rows = rows
+        self._clamp()
+
+    def feed(self, data: bytes):
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ''
+        pos = 0
+        for match in _sequences.finditer(text):
+            if match.start() > pos:
+                self._print(text[pos:match.start()])
+            pos = match.end()
+            if match.group(5) is not None:
+                self._control(match.group(5))
+            elif match.group(4) is not None:
+                self._escape(match.group(4))
+            elif match.group(3) is not None:
+                self._csi(match.group(1), match.group(2), match.group(3))
+
+        rest = text[pos:]
+        esc = rest.find('\x1b')
+        if esc >= 0:
+            # incomplete sequence, wait for the rest (unless it's too long to be a real one)
+            self._pending = rest[esc:] if len(rest) - esc < 256 else ''
+            rest = rest[:esc]
+        if rest:
+            self._print(rest)
+
+    def text(self) -> str:
+        lines = [''.join(line).rstrip() for line in self.buffer]
+        while lines and not lines[-1]:
+            lines.pop()
+        return '\n'.join(lines)
+
+    def _clamp(self):
+        self.row = min(max(self.row, 0), self.rows - 1)
+        self.col = min(max(self.col, 0), self.cols - 1)
+
+    def _print(self, text: str):
+        while text:
+            if self.col >= self.cols:
+                # autowrap is delayed until the next character, like real terminals do
+                self.col = 0
+                self._linefeed()
+            n = min(self.cols - self.col, len(text))
+            self.buffer[self.row][self.col:self.col + n] = text[:n]
+            self.col += n
+            text = text[n:]
+
+    def _linefeed(self):
+        if self.row == self.rows - 1:
+            self.buffer.pop(0)
+            self.buffer.append(self._blank())
+        else:
+            self.row += 1
+
+    def _reverse_linefeed(self):
+        if self.row == 0:
+            self.buffer.pop()
+            self.buffer.insert(0, self._blank())
+        else:
+            self.row -= 1
+
+    def _control(self, char: str):
+        match char:
+            case '\n' | '\x0b' | '\x0c':
+                self.col = min(self.col, self.cols - 1)
+                self._linefeed()
+            case '\r':
+                self.col = 0
+            case '\b':
+                self.col = max(min(self.col, self.cols - 1) - 1, 0)
+            case '\t':
+                self.col = min((self.col // 8 + 1) * 8, self.cols - 1)
+
+    def _escape(self, command: str):
+        match command:
+            case 'c':
+                self._erase_display(2)
+                self.row = self.col = 0
+            case 'D':
+                self._linefeed()
+            case 'E':
+                self.col = 0
+                self._linefeed()
+            case 'M':
+                self._reverse_linefeed()
+            case '7':
+                self._saved = (self.row, self.col)
+            case '8':
+                self.row, self.col = self._saved
+                self._clamp()
+
+    def _erase_display(self, mode: int):
+        if mode == 0:
+            self._erase_line(0)
+            for r in range(self.row + 1, self.rows):
+                self.buffer[r] = self._blank()
+        elif mode == 1:
+            self._erase_line(1)
+            for r in range(self.row):
+                self.buffer[r] = self._blank()
+        else:
+            self.buffer = [self._blank() for _ in range(self.rows)]
+
+    def _erase_line(self, mode: int):
+        line = self.buffer[self.row]
+        col = min(self.col, self.cols - 1)
+        if mode == 0:
+            line[col:] = [' '] * (self.cols - col)
+        elif mode == 1:
+            line[:col + 1] = [' '] * (col + 1)
+        else:
+            self.buffer[self.row] = self._blank()
+
+    def _csi(self, private: str, params: str, command: str):
+        if private:
+            # private modes, the only one affecting the content is the alternate screen
+            if command in 'hl' and params in ('47', '1047', '1049'):
+                self._erase_display(2)
+            return
+
+        args = [int(p) if p.isdigit() else 0 for p in params.replace(':', ';').split(';')]
+        n = args[0] or 1
+        match command:
+            case 'A':
+                self.row -= n
+            case 'B' | 'e':
+                self.row += n
+            case 'C' | 'a':
+                self.col += n
+            case 'D':
+                self.col = min(self.col, self.cols - 1) - n
+            case 'E':
+                self.row, self.col = self.row + n, 0
+            case 'F':
+                self.row, self.col = self.row - n, 0
+            case 'G' | '`':
+                self.col = n - 1
+            case 'd':
+                self.row = n - 1
+            case 'H' | 'f':
+                self.row, self.col = n - 1, (args[1] if len(args) > 1 and args[1] else 1) - 1
+            case 'J':
+                self._erase_display(args[0])
+            case 'K':
+                self._erase_line(args[0])
+            case 'L':
+                n = min(n, self.rows - self.row)
+                del self.buffer[self.rows - n:]
+                self.buffer[self.row:self.row] = [self._blank() for _ in range(n)]
+            case 'M':
+                n = min(n, self.rows - self.row)
+                del self.buffer[self.row:self.row + n]
+                self.buffer += [self._blank() for _ in range(n)]
+            case 'S':
+                for _ in range(n):
+                    self.buffer.pop(0)
+                    self.buffer.append(self._blank())
+            case 'T':
+                for _ in range(n):
+                    self.buffer.pop()
+                    self.buffer.insert(0, self._blank())
+            case 'P' | 'X' | '@':
+                line = self.buffer[self.row]
+                col = min(self.col, self.cols - 1)
+                n = min(n, self.cols - col)
+                if command == 'P':
+                    line[col:] = line[col + n:] + [' '] * n
+                elif command == 'X':
+                    line[col:col + n] = [' '] * n
+                else:
+                    line[col:] = ([' '] * n + line[col:])[:self.cols - col]
+            case 'r':
+                # scroll regions are not supported, but setting one moves the cursor home
+                self.row = self.col = 0
+            case _:
+                # SGR (colors) and everything else don't change the text
+                return
+        self._clamp()
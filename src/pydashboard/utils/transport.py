@@ -0,0 +1,157 @@
+"""
+Serialization of module results sent from pydashboard-server to remote widgets.
+
+Results are packed into a single `bytes` object, so they travel through rpyc by value in one message instead of being
+pickled (tables) or accessed attribute by attribute through netrefs (rich Text). The first byte tells the kind of
+payload:
+
+- strings are sent as UTF-8
+- rich Text is sent as its plain text and spans, JSON encoded
+- tables use Arrow IPC when pyarrow is installed on both sides, otherwise a zlib compressed columnar JSON
+"""
+import json
+import zlib
+from datetime import date, datetime
+from time import struct_time
+from typing import Any, TYPE_CHECKING
+
+from rich.style import Style
+from rich.text import Span, Text
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+NONE = b'N'
+STR = b'S'
+TEXT = b'T'
+TABLE_JSON = b'J'
+TABLE_ARROW = b'A'
+
+ARROW_AVAILABLE = pyarrow is not None
+
+
+def pack(result: Any, columns: list[str] = None, arrow: bool = False) -> bytes | Any:
+    """
+    Serialize the result of a module call.
+
+    Args:
+        result: Value returned by the module
+        columns: For tables, send only these columns (missing ones are ignored)
+        arrow: Whether the receiver can decode Arrow IPC
+
+    Returns:
+        The packed result, or `result` itself if its type is not supported.
+    """
+    if result is None:
+        return NONE
+    if isinstance(result, str):
+        return STR + result.encode()
+    if isinstance(result, Text):
+        return TEXT + json.dumps({
+            'plain'  : result.plain,
+            'spans'  : [(s.start, s.end, str(s.style)) for s in result.spans],
+            'style'  : str(result.style),
+            'justify': result.justify,
+            'end'    : result.end,
+        }).encode()
+    if _is_dataframe(result):
+        if columns:
+            result = result[[c for c in dict.fromkeys(columns) if c in result.columns]]
+        if arrow and ARROW_AVAILABLE:
+            try:
+                return TABLE_ARROW + _pack_arrow(result)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError):
+                # mixed type columns can't be converted, use the generic format
+                pass
+        return TABLE_JSON + _pack_json(result)
+    return result
+
+
+def unpack(payload: bytes | Any) -> Any:
+    """Inverse of `pack`, values that are not packed are returned unchanged"""
+    if not isinstance(payload, bytes):
+        return payload
+
+    kind, data = payload[:1], payload[1:]
+    if kind == NONE:
+        return None
+    if kind == STR:
+        return data.decode()
+    if kind == TEXT:
+        obj = json.loads(data)
+        return Text(obj['plain'], style=obj['style'], justify=obj['justify'], end=obj['end'],
+                    spans=[Span(s, e, Style.parse(style)) for s, e, style in obj['spans']])
+    if kind == TABLE_ARROW:
+        with pyarrow.ipc.open_stream(data) as reader:
+            return reader.read_pandas()
+    if kind == TABLE_JSON:
+        return _unpack_json(data)
+    raise ValueError(f'Unknown payload kind {kind!r}')
+
+
+def _is_dataframe(obj) -> bool:
+    # avoid importing pandas just to check the type
+    return type(obj).__name__ == 'DataFrame' and type(obj).__module__.startswith('pandas')
+
+
+def _pack_arrow(df: 'DataFrame') -> bytes:
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _encode(obj):
+    # types found in module results that json can't handle
+    if isinstance(obj, (datetime, date)):
+        return {'$datetime': obj.isoformat()}
+    if hasattr(obj, 'item'):
+        # numpy scalars
+        return obj.item()
+    return str(obj)
+
+
+def _column_values(column) -> list:
+    values = column.to_list()
+    if column.dtype == object:
+        # struct_time is a tuple, it would be silently encoded as a list
+        values = [{'$struct_time': list(v)} if isinstance(v, struct_time) else v for v in values]
+    return values
+
+
+def _decode(obj: dict):
+    if len(obj) == 1:
+        if '$struct_time' in obj:
+            return struct_time(obj['$struct_time'])
+        if '$datetime' in obj:
+            return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+
+def _pack_json(df: 'DataFrame') -> bytes:
+    payload = {
+        'columns': [str(c) for c in df.columns],
+        'dtypes' : [str(t) for t in df.dtypes],
+        'data'   : [_column_values(df[c]) for c in df.columns],
+    }
+    return zlib.compress(json.dumps(payload, default=_encode, separators=(',', ':')).encode(), 1)
+
+
+def _unpack_json(data: bytes) -> 'DataFrame':
+    from pandas import DataFrame, Series
+
+    payload = json.loads(zlib.decompress(data), object_hook=_decode)
+    columns = {}
+    for name, dtype, values in zip(payload['columns'], payload['dtypes'], payload['data']):
+        try:
+            columns[name] = Series(values, dtype=dtype)
+        except (TypeError, ValueError):
+            columns[name] = Series(values, dtype=object)
+    return DataFrame(columns)